@@ -1,87 +1,155 @@
-def forecast_expenses(data_json=None, previous_forecast=None, test_size=30):
-    import numpy as np
-    import pandas as pd
-    from statsmodels.tsa.holtwinters import ExponentialSmoothing
-    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.holtwinters import ExponentialSmoothing
+from app import engines
+from app import smoothing
+from app.ingest import ingest
+from app.cache import cache_from_env, shared_path
+
+logger = logging.getLogger(__name__)
+
+# Fitted forecasts keyed by the daily expense series they were fitted on. With
+# a forecast pool or several uvicorn workers they default to a SQLite file
+# all those processes share
+forecast_cache = cache_from_env("FORECAST_CACHE", default_path=shared_path("forecast_cache"))
+
+# NumPy equivalents of the sklearn.metrics scores, so serving never imports sklearn
+def mean_absolute_error(actual, predicted):
+    actual, predicted = np.asarray(actual, dtype=np.float64), np.asarray(predicted, dtype=np.float64)
+    return float(np.mean(np.abs(actual - predicted)))
+
+def mean_squared_error(actual, predicted):
+    actual, predicted = np.asarray(actual, dtype=np.float64), np.asarray(predicted, dtype=np.float64)
+    return float(np.mean((actual - predicted) ** 2))
+
+def r2_score(actual, predicted):
+    actual = np.asarray(actual, dtype=np.float64).reshape(-1, 1)
+    predicted = np.asarray(predicted, dtype=np.float64).reshape(-1, 1)
+    numerator = ((actual - predicted) ** 2).sum(axis=0)[0]
+    denominator = ((actual - np.average(actual, axis=0)) ** 2).sum(axis=0)[0]
+    if denominator == 0:
+        return 1.0 if numerator == 0 else 0.0
+    return float(1 - numerator / denominator)
+
+def warm_up():
+    """Run one small fit so the first request skips statsmodels' first-call setup."""
+    periods = 2 * smoothing.SEASONAL_PERIODS
+    series = pd.Series(
+        100 + 10 * np.sin(np.arange(periods) * 2 * np.pi / smoothing.SEASONAL_PERIODS),
+        index=pd.date_range("2025-01-01", periods=periods)
+    )
+    ExponentialSmoothing(series, trend='add', seasonal='add', seasonal_periods=smoothing.SEASONAL_PERIODS).fit().forecast(30)
+
+def series_fingerprint(daily_expenses, test_size):
+    """Hash of a daily-aggregated expense series and the forecast horizon."""
+    digest = hashlib.sha256()
+    digest.update(f"{test_size}|{daily_expenses.index.tz}|".encode())
+    digest.update(daily_expenses.index.asi8.tobytes())
+    digest.update(daily_expenses.to_numpy(dtype='float64').tobytes())
+    return digest.hexdigest()
+
+def forecast_dates(last_date, test_size):
+    """test_size days starting on the first of the month after last_date."""
+    first_of_next_month = (last_date + pd.offsets.MonthBegin(1)).normalize()
+    future_dates = pd.date_range(start=first_of_next_month, periods=test_size)
+    logger.debug("event=future_dates start=%s periods=%d", future_dates[0], len(future_dates))
+    return future_dates
+
+def previous_forecast_metrics(actual_previous_expense, previous_forecast):
+    """Scores of the previous forecast against the actual expenses of the days it covered."""
+    forecasted_values = previous_forecast.forecasted
+    forecasted_dates = pd.to_datetime(previous_forecast.dates).tz_localize(None)
+    previous_forecast_series = pd.Series(forecasted_values, index=forecasted_dates)
+    actual_previous_expense.index = actual_previous_expense.index.tz_localize(None)
+
+    previous_forecast_series = previous_forecast_series.loc[actual_previous_expense.index]
+
+    mae = mean_absolute_error(actual_previous_expense, previous_forecast_series)
+    rmse = np.sqrt(mean_squared_error(actual_previous_expense, previous_forecast_series))
+    r2 = r2_score(actual_previous_expense, previous_forecast_series)
+
+    return {
+        "mae": mae,
+        "rmse": rmse,
+        "r2": r2
+    }
 
+def forecast_expenses(data_json=None, previous_forecast=None, test_size=30):
     try:
         if(data_json):
-            # 1. Convert input expense data into a DataFrame
-            df = pd.DataFrame(data_json)
-            df['date'] = pd.to_datetime(df['date'])
-            df = df.sort_values(by='date').reset_index(drop=True)
-
-            # 2. Filter only expenses
-            df = df[df['type'] == 'Expense']
-
-            # 3. Group by date and sum
-            df_daily_expenses = df.groupby('date')['totalAmount'].sum().reset_index()
-            df_daily_expenses.columns = ['date', 'amount']
-            df_daily_expenses = df_daily_expenses.sort_values(by='date')
-            df_daily_expenses.set_index('date', inplace=True)
+            # 1-3. Parse the transactions (unless already ingested) into daily expense totals
+            transactions = ingest(data_json)
+            user_id = transactions.user_id
+            daily_expenses = transactions.daily_series()
 
-            print("TRANSACTIONS GROUPED: ", df_daily_expenses)
+            logger.debug("event=transactions_grouped days=%d\n%s", len(daily_expenses), daily_expenses)
 
             # 4. Prepare the test data (actual expenses of the past N days)
-            actual_previous_expense = df_daily_expenses[-test_size:]
-
-            print("LAST MONTH TRANSACTIONS: ", actual_previous_expense)
-
-            # 5. Train the model
-            model = ExponentialSmoothing(
-                df_daily_expenses['amount'],
-                trend='add',
-                seasonal='add',
-                seasonal_periods=30
-            )
-            model_fit = model.fit()
-
-            # 6. Forecast
-            forecast = model_fit.forecast(test_size)
-
-            # Get the last date in your data
-            last_date = df_daily_expenses.index[-1]
-
-            # Calculate the first day of the next month
-            first_of_next_month = (last_date + pd.offsets.MonthBegin(1)).normalize()
-
-            # Generate future dates starting from the first of next month
-            future_dates = pd.date_range(start=first_of_next_month, periods=test_size)
-
-            print("FUTURE DATES:", future_dates)
+            actual_previous_expense = daily_expenses.iloc[-test_size:]
+
+            logger.debug("event=last_month_transactions\n%s", actual_previous_expense)
+
+            # 5. Train the model, unless this exact series was fitted recently
+            cache_key = series_fingerprint(daily_expenses, test_size)
+            fitted = forecast_cache.get(cache_key)
+
+            if fitted is None:
+                # Short histories go to the NumPy engines; statsmodels only
+                # fits series long enough for its Holt-Winters initialization
+                engine = engines.select_engine(len(daily_expenses))
+                if engine is None:
+                    raise ValueError("No expense transactions to forecast")
+
+                if engine != "holt_winters":
+                    forecast = pd.Series(engines.forecast(engine, daily_expenses.to_numpy(dtype='float64'), test_size))
+                else:
+                    # Fold the new days into the user's stored state when possible,
+                    # otherwise re-optimize from scratch
+                    forecast_values = smoothing.incremental_forecast(user_id, daily_expenses, test_size)
+
+                    if forecast_values is None:
+                        model = ExponentialSmoothing(
+                            daily_expenses,
+                            trend='add',
+                            seasonal='add',
+                            seasonal_periods=smoothing.SEASONAL_PERIODS
+                        )
+                        model_fit = model.fit()
+                        smoothing.save_fitted_state(user_id, daily_expenses, model_fit)
+
+                        # 6. Forecast
+                        forecast = model_fit.forecast(test_size)
+                    else:
+                        forecast = pd.Series(forecast_values)
+
+                # Forecast days start on the first of the month after the last day
+                forecast.index = forecast_dates(daily_expenses.index[-1], test_size)
+
+                fitted = {
+                    "engine": engine,
+                    "forecast": forecast.tolist(),
+                    "dates": forecast.index.strftime('%Y-%m-%dT%H:%M:%S.000+00:00').tolist(),
+                    "total_forecasted": float(forecast.sum())
+                }
+                forecast_cache.set(cache_key, fitted)
 
-            # Assign those to forecast
-            forecast.index = future_dates
-            
             result = {
                 "success": True,
-                "forecast": forecast.tolist(),
-                "dates": forecast.index.strftime('%Y-%m-%dT%H:%M:%S.000+00:00').tolist(),
+                "forecast": list(fitted["forecast"]),
+                "dates": list(fitted["dates"]),
                 "metrics": {
-                    "total_forecasted": forecast.sum()
+                    "total_forecasted": fitted["total_forecasted"],
+                    # Entries cached before the engines existed all came from statsmodels
+                    "engine": fitted.get("engine", "holt_winters")
                 }
             }
 
-            print("PREVIOUS FORECAST", previous_forecast)
+            logger.debug("event=previous_forecast value=%s", previous_forecast)
             # 7. Optional evaluation using previous forecast
             if previous_forecast.forecasted:
-                
-                forecasted_values = previous_forecast.forecasted
-                forecasted_dates = pd.to_datetime(previous_forecast.dates).tz_localize(None)
-                previous_forecast_series = pd.Series(forecasted_values, index=forecasted_dates)
-                actual_previous_expense.index = actual_previous_expense.index.tz_localize(None)
-
-                previous_forecast_series = previous_forecast_series.loc[actual_previous_expense.index]
-
-                mae = mean_absolute_error(actual_previous_expense['amount'], previous_forecast_series)
-                rmse = np.sqrt(mean_squared_error(actual_previous_expense['amount'], previous_forecast_series))
-                r2 = r2_score(actual_previous_expense['amount'], previous_forecast_series)
-
-                result["metrics"].update({
-                    "mae": mae,
-                    "rmse": rmse,
-                    "r2": r2
-                })
+                result["metrics"].update(previous_forecast_metrics(actual_previous_expense, previous_forecast))
 
             return result
         else: 
@@ -91,8 +159,75 @@ def forecast_expenses(data_json=None, previous_forecast=None, test_size=30):
         }
 
     except Exception as e:
-        print("Forecasting error:", e)
+        logger.warning("event=forecast_failed error=%s", e)
         return {
             "success": False,
             "message": e
         }
+
+def forecast_batch(data_jsons, previous_forecasts=None, test_size=30):
+    """
+    forecast_expenses for many users, one result per user in the same shape.
+
+    Histories long enough for the monthly Holt-Winters model are fitted
+    together by engines.fit_batch instead of one statsmodels fit each;
+    shorter ones use their NumPy engine as in forecast_expenses. Neither the
+    forecast cache nor the per-user smoothing state is used. A previous
+    forecast, where given, is scored as in forecast_expenses.
+    """
+    previous_forecasts = previous_forecasts or [None] * len(data_jsons)
+    results = [None] * len(data_jsons)
+    series, forecasts, used_engines = {}, {}, {}
+
+    for i, data_json in enumerate(data_jsons):
+        try:
+            transactions = ingest(data_json) if data_json else None
+            if transactions is None:
+                results[i] = {"success": False, "message": "No transactions"}
+                continue
+            series[i] = transactions.daily_series()
+            engine = engines.select_engine(len(series[i]))
+            if engine is None:
+                raise ValueError("No expense transactions to forecast")
+            if engine != "holt_winters":
+                forecasts[i] = engines.forecast(engine, series[i].to_numpy(dtype='float64'), test_size)
+                used_engines[i] = engine
+        except Exception as e:
+            logger.warning("event=forecast_failed error=%s", e)
+            results[i] = {"success": False, "message": e}
+
+    # Every monthly-seasonal history in one array, right-aligned on its last day
+    batch = [i for i in series if i not in forecasts]
+    if batch:
+        width = max(len(series[i]) for i in batch)
+        Y = np.full((len(batch), width), np.nan)
+        for row, i in enumerate(batch):
+            Y[row, width - len(series[i]):] = series[i].to_numpy(dtype='float64')
+        fitted = engines.fit_batch(Y, seasonal_periods=smoothing.SEASONAL_PERIODS, trend=True, phi=1.0)
+        for i, values in zip(batch, engines.forecast_from_fit(fitted, test_size)):
+            forecasts[i] = values
+            used_engines[i] = "holt_winters_batch"
+
+    for i, values in forecasts.items():
+        try:
+            forecast = pd.Series(values, index=forecast_dates(series[i].index[-1], test_size))
+            result = {
+                "success": True,
+                "forecast": forecast.tolist(),
+                "dates": forecast.index.strftime('%Y-%m-%dT%H:%M:%S.000+00:00').tolist(),
+                "metrics": {
+                    "total_forecasted": float(forecast.sum()),
+                    "engine": used_engines[i]
+                }
+            }
+            # Read like forecast_expenses does: without a previous forecast the
+            # user's forecast fails the same way, and the endpoint answers RF-only
+            previous_forecast = previous_forecasts[i]
+            if previous_forecast.forecasted:
+                result["metrics"].update(previous_forecast_metrics(series[i].iloc[-test_size:], previous_forecast))
+            results[i] = result
+        except Exception as e:
+            logger.warning("event=forecast_failed error=%s", e)
+            results[i] = {"success": False, "message": e}
+
+    return results
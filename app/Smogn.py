@@ -1,137 +1,166 @@
 import numpy as np
 import pandas as pd
 import smogn
+import argparse
+import hashlib
 import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from app.utils import convert_to_numeric, ordinal_mappings
+
+# Run from the repository root:
+#   python -m app.Smogn [--n-jobs 5] [--rel-thres 0.8] [--target-rel-thres Academic_Expenses=0.7]
+#
+# SMOGN runs once per expense target, each in its own worker process with a
+# fixed seed. Every target's result is cached under dataset/.cache/smogn
+# (TRAIN_CACHE_DIR), keyed by the input data and that target's parameters, so
+# a rerun only recomputes the targets whose input or parameters changed.
 
-# Load the dataset
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 csv_path = os.path.join(BASE_DIR, "dataset", "Student-Spending-Habits.csv")
-df = pd.read_csv(csv_path)
-
-print(df.head())
-
-# Step 1: Handle missing values by dropping rows with NaN values
-df_cleaned = df.dropna().reset_index(drop=True)
-
-# Step 2: Convert object-type numerical fields to numeric
-numeric_cols = ["Monthly_Allowance"]
-def convert_to_numeric(value):
-    if isinstance(value, str):
-        value = value.lower().replace(',', '').strip()
-        if 'k' in value:
-            return float(value.replace('k', '')) * 1000
-        try:
-            return float(value)
-        except ValueError:
-            return np.nan
-    return value
-
-df_cleaned[numeric_cols] = df_cleaned[numeric_cols].applymap(convert_to_numeric)
-
-# Step 5: Convert expenses into percentages of Monthly Allowance
-expense_cols = ["Living_Expenses", "Food_and_Dining_Expenses", 
-                "Transportation_Expenses", "Leisure_and_Entertainment_Expenses", "Academic_Expenses"]
-
-# Mapping categorical values
-age_mapping = {
-    "Under 18": 1,
-    "18-20": 2,
-    "21-23": 3,
-    "24-26": 4,
-    "27 and above": 5,
-}
-year_level_mapping = {
-    "Freshman": 1,
-    "Sophomore": 2,
-    "Junior": 3,
-    "Senior": 4
-}
-roommates_mapping = {
-    "With family": 0,
-    "I live alone": 1,
-    "I live with 1 roommate": 2,
-    "I live with 2-3 roommates": 3,
-    "I live with more than 3 roommates": 4
-}
-study_hours_mapping = {
-    "Less then 10 hours": 1,
-    "10-20 hours": 2,
-    "21-30 hours": 3,
-    "31-40 hours": 4,
-    "More then 40 hours": 5
-} 
-income_mapping = {
-    "Less than P12,030": 1,
-    "P12,031 - P24,060": 2,
-    "P24,061 - P48,120": 3,
-    "P48,121 - P84,210": 4,
-    "P84,211 - P144,360": 5,
-    "P144,361 - P240,600": 6,
-    "More than P240,601": 7
-}
-going_home_mapping = {
-    "Not at all": 1,
-    "Rarely": 2,
-    "Sometimes": 3,
-    "Often": 4,
-    "Always": 5
-}
-
-df_cleaned["Age_Group"] = df_cleaned["Age_Group"].map(age_mapping)
-df_cleaned["Year_Level"] = df_cleaned["Year_Level"].map(year_level_mapping)
-df_cleaned["Roommates"] = df_cleaned["Roommates"].map(roommates_mapping)
-df_cleaned["Hours_of_Study_per_Week"] = df_cleaned["Hours_of_Study_per_Week"].map(study_hours_mapping)
-df_cleaned["Family_Monthly_Income"] = df_cleaned["Family_Monthly_Income"].map(income_mapping)
-df_cleaned["Frequency_of_Going_Home"] = df_cleaned["Frequency_of_Going_Home"].map(going_home_mapping)
-
-# Identify and encode binary Yes/No columns
-categorical_cols = df_cleaned.select_dtypes(include=['object']).columns.tolist()
-yes_no_cols = [col for col in df_cleaned.columns if df_cleaned[col].dropna().isin(["Yes", "No"]).all()]
-df_cleaned[yes_no_cols] = df_cleaned[yes_no_cols].apply(lambda x: x.map({"Yes": 1, "No": 0}))
-categorical_cols = [col for col in categorical_cols if col not in yes_no_cols]
-df_encoded = pd.get_dummies(df_cleaned, columns=categorical_cols, drop_first=True)
-
-# Separate features and targets
-X = df_encoded.drop(columns=expense_cols)
-y = df_encoded[expense_cols]
-
-# -------------- ✅ SMOGN BALANCING SECTION --------------
-# Combine X and y for SMOGN processing
-df_combined = pd.concat([X, y], axis=1)
-
-# Drop NaN/infinite and constant columns
-df_combined = df_combined.replace([np.inf, -np.inf], np.nan).dropna()
-nunique = df_combined.apply(pd.Series.nunique)
-df_combined = df_combined.drop(columns=nunique[nunique == 1].index.tolist())
-
-# Ensure all boolean columns are int
-for col in df_combined.select_dtypes(include=['bool']).columns:
-    df_combined[col] = df_combined[col].astype(int)
-
-# Apply SMOGN per target variable
-augmented_dataframes = []
-for target in expense_cols:
-    print(f"/nApplying SMOGN to: {target}")
-    smogn_input = df_combined.copy()
-    smogn_input = smogn_input.rename(columns={target: 'y'})
-    try:
-        smogn_result = smogn.smoter(data=smogn_input, y='y', rel_thres=0.8, rel_method='auto')
-        smogn_result = smogn_result.rename(columns={'y': target})
-        augmented_dataframes.append(smogn_result)
-    except Exception as e:
-        print(f"Error applying SMOGN to {target}: {e}")
-
-# Merge all balanced target datasets
-from functools import reduce
-from operator import or_
-
-# Use index to align rows and drop duplicates
-augmented_data = pd.concat(augmented_dataframes, ignore_index=True).drop_duplicates()
-
-# Save to CSV
-
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 output_path = os.path.join(BASE_DIR, "dataset", "Student-Spending-Habits_PreProcessed.csv")
+cache_dir = os.path.join(os.environ.get("TRAIN_CACHE_DIR", os.path.join(BASE_DIR, "dataset", ".cache")), "smogn")
+
+expense_cols = ["Living_Expenses", "Food_and_Dining_Expenses",
+                "Transportation_Expenses", "Leisure_and_Entertainment_Expenses", "Academic_Expenses"]
 
-augmented_data.to_csv(output_path, index=False)
-print(f"✅ Saved combined dataset with synthetic rows at: {output_path}")
\ No newline at end of file
+def prepare_dataset(path=csv_path):
+    """Encode the survey responses into the numeric frame SMOGN balances."""
+    df = pd.read_csv(path)
+
+    # Step 1: Handle missing values by dropping rows with NaN values
+    df_cleaned = df.dropna().reset_index(drop=True)
+
+    # Step 2: Convert object-type numerical fields to numeric
+    df_cleaned["Monthly_Allowance"] = df_cleaned["Monthly_Allowance"].map(convert_to_numeric)
+
+    # Mapping categorical values
+    for field, mapping in ordinal_mappings.items():
+        df_cleaned[field] = df_cleaned[field].map(mapping)
+
+    # Identify and encode binary Yes/No columns
+    categorical_cols = df_cleaned.select_dtypes(include=['object']).columns.tolist()
+    yes_no_cols = [col for col in df_cleaned.columns if df_cleaned[col].dropna().isin(["Yes", "No"]).all()]
+    df_cleaned[yes_no_cols] = df_cleaned[yes_no_cols].apply(lambda x: x.map({"Yes": 1, "No": 0}))
+    categorical_cols = [col for col in categorical_cols if col not in yes_no_cols]
+    df_encoded = pd.get_dummies(df_cleaned, columns=categorical_cols, drop_first=True)
+
+    # Separate features and targets, then combine them for SMOGN processing
+    X = df_encoded.drop(columns=expense_cols)
+    y = df_encoded[expense_cols]
+    df_combined = pd.concat([X, y], axis=1)
+
+    # Drop NaN/infinite and constant columns
+    df_combined = df_combined.replace([np.inf, -np.inf], np.nan).dropna()
+    nunique = df_combined.apply(pd.Series.nunique)
+    df_combined = df_combined.drop(columns=nunique[nunique == 1].index.tolist())
+
+    # Ensure all boolean columns are int
+    for col in df_combined.select_dtypes(include=['bool']).columns:
+        df_combined[col] = df_combined[col].astype(int)
+
+    return df_combined
+
+def frame_hash(df):
+    digest = hashlib.sha256()
+    digest.update("|".join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def target_seed(seed, target):
+    # Derived from the target's name, so adding or reordering targets keeps each one's output
+    return int(hashlib.sha256(f"{seed}|{target}".encode()).hexdigest()[:8], 16)
+
+def cache_key(input_hash, target, params):
+    description = f"{input_hash}|{target}|{sorted(params.items())}|smogn-{getattr(smogn, '__version__', '')}"
+    return hashlib.sha256(description.encode()).hexdigest()[:16]
+
+def smoter_target(df_combined, target, params):
+    """Balance one target; runs in a worker process."""
+    start = time.perf_counter()
+    random.seed(params["seed"])
+    np.random.seed(params["seed"])
+
+    smogn_input = df_combined.rename(columns={target: 'y'})
+    smogn_result = smogn.smoter(data=smogn_input, y='y', rel_thres=params["rel_thres"], rel_method=params["rel_method"])
+    return smogn_result.rename(columns={'y': target}), time.perf_counter() - start
+
+def augment(df_combined, target_params, n_jobs=None):
+    """
+    SMOGN output per target, in expense_cols order. Targets that fail are
+    reported and left out, as before.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    input_hash = frame_hash(df_combined)
+    results, report, pending = {}, {}, {}
+
+    for target, params in target_params.items():
+        path = os.path.join(cache_dir, f"{cache_key(input_hash, target, params)}.pkl")
+        if os.path.exists(path):
+            results[target] = pd.read_pickle(path)
+            report[target] = {"seconds": 0.0, "rows": len(results[target]), "cached": True}
+        else:
+            pending[target] = path
+
+    # smoter reads a few cells of matrices it allocates without initializing, so
+    # its output depends on the worker's heap. A fresh process per target keeps
+    # that reproducible no matter which targets share a worker.
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=get_context("spawn"), max_tasks_per_child=1) as executor:
+        futures = {
+            target: executor.submit(smoter_target, df_combined, target, target_params[target])
+            for target in pending
+        }
+        for target, future in futures.items():
+            try:
+                result, seconds = future.result()
+            except Exception as e:
+                print(f"Error applying SMOGN to {target}: {e}")
+                report[target] = {"seconds": None, "rows": 0, "cached": False, "error": str(e)}
+                continue
+            result.to_pickle(pending[target])
+            results[target] = result
+            report[target] = {"seconds": seconds, "rows": len(result), "cached": False}
+
+    return [results[target] for target in target_params if target in results], report
+
+def parse_target_params(args):
+    params = {
+        target: {"rel_thres": args.rel_thres, "rel_method": args.rel_method, "seed": target_seed(args.seed, target)}
+        for target in expense_cols
+    }
+    for override in args.target_rel_thres:
+        target, value = override.split("=")
+        params[target]["rel_thres"] = float(value)
+    return params
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Balance the survey data with SMOGN, one target per process.")
+    parser.add_argument("--rel-thres", type=float, default=0.8)
+    parser.add_argument("--rel-method", choices=["auto", "manual"], default="auto")
+    parser.add_argument("--target-rel-thres", nargs="*", default=[], metavar="TARGET=VALUE",
+                        help="rel_thres for individual targets")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--n-jobs", type=int, default=None, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df_combined = prepare_dataset()
+    print(f"Encoded {len(df_combined)} rows x {df_combined.shape[1]} columns")
+
+    augmented_dataframes, report = augment(df_combined, parse_target_params(args), n_jobs=args.n_jobs)
+    for target in expense_cols:
+        entry = report[target]
+        status = "cached" if entry["cached"] else ("failed" if "error" in entry else f"{entry['seconds']:.1f}s")
+        print(f"{target:36s} {status:>8s} {entry['rows']:6d} rows")
+
+    if not augmented_dataframes:
+        raise SystemExit("SMOGN failed for every target; nothing was written")
+
+    # Merge all balanced target datasets, dropping duplicated rows
+    augmented_data = pd.concat(augmented_dataframes, ignore_index=True).drop_duplicates()
+
+    augmented_data.to_csv(output_path, index=False)
+    print(f"✅ Saved combined dataset with {len(augmented_data)} rows at: {output_path} "
+          f"({time.perf_counter() - start:.1f}s)")
@@ -2,92 +2,255 @@ import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.multioutput import MultiOutputRegressor
-from sklearn.model_selection import train_test_split, RandomizedSearchCV
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-import matplotlib.pyplot as plt
-import pickle
+from sklearn.model_selection import train_test_split
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingRandomSearchCV
+from sklearn.metrics import r2_score
+import argparse
+import hashlib
 import os
+import threading
+import time
+from app import artifacts
+from app.forest import CompiledForest
+
+# Run from the repository root:
+#   python -m app.SocioDemoRF                     # fixed hyperparameters, as deployed
+#   python -m app.SocioDemoRF --search halving    # successive-halving hyperparameter search
 
-# Load the dataset
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 csv_path = os.path.join(BASE_DIR, "dataset", "Student-Spending-Habits_PreProcessed.csv")
-df = pd.read_csv(csv_path)
+cache_dir = os.environ.get("TRAIN_CACHE_DIR", os.path.join(BASE_DIR, "dataset", ".cache"))
 
 # Target columns
-expense_cols = ["Living_Expenses", "Food_and_Dining_Expenses", 
+expense_cols = ["Living_Expenses", "Food_and_Dining_Expenses",
                 "Transportation_Expenses", "Leisure_and_Entertainment_Expenses", "Academic_Expenses"]
 
-# Separate features and targets
-X = df.drop(columns=expense_cols)
-y = df[expense_cols]
-
-# Splitting the data into training and testing sets
-X_train, X_test, Y_train, Y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+# Hyperparameters of the deployed model
+base_params = dict(n_estimators=250, min_samples_leaf=5, min_samples_split=2, max_features=None, max_depth=None, random_state=2)
 
-# Define the parameter grid for hyperparameter tuning
+# Search space; n_estimators is the resource that successive halving grows
 param_grid = {
-    'n_estimators': [100, 250, 500],
     'max_depth': [None, 10, 20, 30],
     'min_samples_split': [2, 5, 10],
     'min_samples_leaf': [1, 5, 10, 20],
     'max_features': ['sqrt', 'log2', None, 10],
 }
 
-# Perform Randomized Search with MultiOutputRegressor
-base_rf = RandomForestRegressor(n_estimators=250, min_samples_leaf=5, min_samples_split=2, max_features=None, max_depth=None, random_state=2)
+def dataset_hash(path):
+    digest = hashlib.sha256()
+    digest.update("|".join(expense_cols).encode())
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-#Finding best Hyperparameter
-# random_search = RandomizedSearchCV(estimator=base_rf,
-#                                    param_distributions=param_grid,
-#                                    n_iter=20,
-#                                    scoring='r2',
-#                                    cv=3,
-#                                    verbose=2,
-#                                    n_jobs=-1,
-#                                    random_state=42)
+def load_dataset(path=csv_path):
+    """
+    Features and targets of the training CSV, and whether they came from the
+    cache. The parsed arrays are cached as .npz keyed by the file's hash, so
+    retraining on the same data skips CSV parsing.
+    """
+    cache_path = os.path.join(cache_dir, f"{dataset_hash(path)[:16]}.npz")
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            X = pd.DataFrame(cached["X"], columns=cached["feature_columns"].tolist())
+            y = pd.DataFrame(cached["y"], columns=expense_cols)
+        return X, y, True
 
-# multioutput_regressor = MultiOutputRegressor(random_search)
+    df = pd.read_csv(path)
+    X = df.drop(columns=expense_cols)
+    y = df[expense_cols]
 
-multioutput_regressor = MultiOutputRegressor(base_rf)
-multioutput_regressor.fit(X_train, Y_train)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez(cache_path, X=X.to_numpy(dtype=np.float64), y=y.to_numpy(dtype=np.float64),
+             feature_columns=np.array(X.columns, dtype=str))
+    return X, y, False
 
-# # Print best parameters for each target
-# for i, estimator in enumerate(multioutput_regressor.estimators_):
-#     print(f"Best parameters for target {i+1}:", estimator.best_params_)
+def split_jobs(n_jobs):
+    """Cores for fitting targets side by side and for the trees within each target."""
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    target_jobs = max(1, min(len(expense_cols), n_jobs))
+    return target_jobs, max(1, n_jobs // target_jobs)
+
+def build_model(search, n_jobs, n_candidates, seed):
+    target_jobs, tree_jobs = split_jobs(n_jobs)
+    base_rf = RandomForestRegressor(**base_params, n_jobs=tree_jobs)
+
+    if search == "halving":
+        # Successive halving: every candidate starts with few trees and only
+        # the best third move on with three times as many
+        estimator = HalvingRandomSearchCV(
+            estimator=base_rf,
+            param_distributions=param_grid,
+            n_candidates=n_candidates,
+            resource='n_estimators',
+            min_resources=20,
+            max_resources=500,
+            factor=3,
+            scoring='r2',
+            cv=3,
+            random_state=seed
+        )
+    else:
+        estimator = base_rf
+
+    return MultiOutputRegressor(estimator, n_jobs=target_jobs)
+
+def peak_memory_mb():
+    """Peak resident memory of this process, or None where getrusage is missing."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class WorkerMemory:
+    """
+    Samples the resident memory of this process's live descendants (the
+    joblib/loky workers fitting the forests) from /proc in a background
+    thread. getrusage only covers children once they have exited, which the
+    reused loky workers have not by the time the report is printed. peak_mb
+    is the largest total seen, or None where /proc is unavailable.
+    """
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.peak_mb = None
+        self.stopped = threading.Event()
+        self.thread = None
 
-#Save model
+    def __enter__(self):
+        if os.path.isdir("/proc/self"):
+            self.peak_mb = 0.0
+            self.thread = threading.Thread(target=self._sample, name="worker-memory", daemon=True)
+            self.thread.start()
+        return self
 
-current_dir = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(current_dir, "SocioDemoRFModel.pkl")
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
 
-with open(model_path, 'wb') as f:
-    pickle.dump(multioutput_regressor, f)
-print("Model trained and saved successfully")
+    def _sample(self):
+        page_mb = os.sysconf("SC_PAGE_SIZE") / 2**20
+        while True:
+            self.peak_mb = max(self.peak_mb, sum(rss_pages(pid) for pid in descendants(os.getpid())) * page_mb)
+            if self.stopped.wait(self.interval):
+                return
 
-# # Predict and evaluate
-# Y_pred = multioutput_regressor.predict(X_test)
+def descendants(pid):
+    """Process ids below pid, read from /proc; processes that exit meanwhile are skipped."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The parent pid follows the state after the parenthesised command name
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    found, frontier = [], [pid]
+    while frontier:
+        frontier = [child for parent in frontier for child in children.get(parent, [])]
+        found += frontier
+    return found
 
-# r2 = r2_score(Y_test, Y_pred)
-# mse = mean_squared_error(Y_test, Y_pred, multioutput='raw_values')
-# mae = mean_absolute_error(Y_test, Y_pred)
+def rss_pages(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return 0
 
+def train(search="none", n_jobs=-1, n_candidates=27, seed=42):
+    timings = {}
+    start = time.perf_counter()
+    X, y, cached = load_dataset()
+    timings["load"] = time.perf_counter() - start
+    print(f"Loaded {X.shape[0]} rows x {X.shape[1]} features ({'cached arrays' if cached else 'parsed CSV'})")
 
-# print("\nEvaluation:")
-# print("R2 Score:", r2)
-# print("Mean Squared Error:", mse)
-# print("Mean Absolute Error:", mae)
+    # Splitting the data into training and testing sets
+    X_train, X_test, Y_train, Y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-# # Actual vs predicted
-# print("\nActual values:\n", Y_test.head())
-# print("\nPredicted values:\n", pd.DataFrame(Y_pred, columns=y.columns).head())
+    start = time.perf_counter()
+    multioutput_regressor = build_model(search, n_jobs, n_candidates, seed)
+    with WorkerMemory() as worker_memory:
+        multioutput_regressor.fit(X_train, Y_train)
+    timings["fit"] = time.perf_counter() - start
+
+    params = {target: base_params for target in expense_cols}
+    if search == "halving":
+        # Serve the refitted best forest of each target
+        for target, estimator in zip(expense_cols, multioutput_regressor.estimators_):
+            print(f"Best parameters for {target}: {estimator.best_params_} "
+                  f"(cv r2 {estimator.best_score_:.3f}, {estimator.n_iterations_} rounds)")
+            params[target] = dict(base_params, **estimator.best_params_)
+        multioutput_regressor.estimators_ = [estimator.best_estimator_ for estimator in multioutput_regressor.estimators_]
+
+    Y_pred = multioutput_regressor.predict(X_test)
+    test_r2 = r2_score(Y_test, Y_pred)
+    print("Test R2 Score:", test_r2)
+
+    start = time.perf_counter()
+    export(multioutput_regressor, X.columns.tolist(), {
+        "training_data": os.path.relpath(csv_path, BASE_DIR),
+        "training_data_hash": dataset_hash(csv_path),
+        "search": search,
+        "params": params,
+        "metrics": {
+            "test_r2": float(test_r2),
+            "test_r2_per_target": dict(zip(expense_cols, r2_score(Y_test, Y_pred, multioutput='raw_values').tolist())),
+            "train_rows": len(X_train),
+            "test_rows": len(X_test)
+        }
+    })
+    timings["export"] = time.perf_counter() - start
+
+    own = peak_memory_mb()
+    print("Wall time: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+          + f", total {sum(timings.values()):.2f}s")
+    if own is not None:
+        if worker_memory.peak_mb is None:
+            print(f"Peak memory: {own:.0f} MB (this process only; worker processes not measured)")
+        else:
+            print(f"Peak memory: {own:.0f} MB, plus up to {worker_memory.peak_mb:.0f} MB "
+                  f"in worker processes during the fit")
+    return multioutput_regressor
+
+def export(multioutput_regressor, feature_columns, manifest):
+    # A new model version: the pickled model, the packed node arrays served by
+    # main.py and a manifest, so serving never has to read the training CSV.
+    # Running servers swap it in on their next poll of MODEL_DIR/CURRENT
+    version = artifacts.publish(
+        CompiledForest.from_estimator(multioutput_regressor),
+        dict(manifest, feature_columns=feature_columns, target_columns=expense_cols),
+        model=multioutput_regressor
+    )
+    print(f"Model version {version} written to {artifacts.models_dir} and made current")
+    return version
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the socio-demographic random forest.")
+    parser.add_argument("--search", choices=["none", "halving"], default="none",
+                        help="'none' fits the deployed hyperparameters; 'halving' searches param_grid")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="cores to use (-1 for all)")
+    parser.add_argument("--n-candidates", type=int, default=27, help="parameter sets the halving search starts with")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    train(search=args.search, n_jobs=args.n_jobs, n_candidates=args.n_candidates, seed=args.seed)
 
 # Feature Importance Plots
+# import matplotlib.pyplot as plt
 # for i, estimator in enumerate(multioutput_regressor.estimators_):
 #     best_rf = estimator
 #     importances = best_rf.feature_importances_
 #     feature_importance_df = pd.DataFrame({'Feature': X.columns, 'Importance': importances})
 #     top_features = feature_importance_df.sort_values(by='Importance', ascending=False).head()
-    
+
 #     plt.figure(figsize=(8, 5))
 #     plt.bar(top_features['Feature'], top_features['Importance'], color='skyblue')
 #     plt.xticks(rotation=45, ha="right")
@@ -95,4 +258,4 @@ print("Model trained and saved successfully")
 #     plt.ylabel("Importance")
 #     plt.title(f"Top 5 Features for Target {expense_cols[i]}")
 #     plt.tight_layout()
-#     plt.show()
\ No newline at end of file
+#     plt.show()
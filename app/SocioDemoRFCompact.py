@@ -0,0 +1,128 @@
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import r2_score
+import argparse
+import json
+import os
+import time
+from app import artifacts
+from app.forest import CompiledForest
+from app.SocioDemoRF import load_dataset
+
+# Run from the repository root:
+#   python -m app.SocioDemoRFCompact --max-r2-drop 0.01
+#   python -m app.SocioDemoRFCompact --max-r2-drop 0.01 --publish   # serve it as a new model version
+#
+# Shrinks the exported forest by keeping fewer trees per target and cutting
+# the trees at a maximum depth, choosing the smallest combination whose
+# held-out R2 stays within --max-r2-drop of the full forest. The held-out
+# rows of SocioDemoRF's split are halved: one half picks the configuration,
+# the other reports the accuracy of the result, so the reported drop is not
+# tuned to the rows it is measured on.
+
+depth_grid = [None, 24, 20, 16, 14, 12, 10, 8, 6]
+
+def per_target_r2(forest, X, y):
+    return r2_score(y, forest.predict(X), multioutput='raw_values')
+
+def fewest_trees(forest, X, y, baseline_r2, max_drop):
+    """Smallest leading tree count per target whose R2 is within max_drop of baseline_r2."""
+    leaves = forest.leaf_values(X)
+    counts = []
+    for target in range(forest.n_targets):
+        start, end = forest.tree_offsets[target], forest.tree_offsets[target + 1]
+        # Prediction of the first k trees for every k at once, summed in sklearn's order
+        preds = np.cumsum(leaves[:, start:end], axis=1) / np.arange(1, end - start + 1)
+        scores = np.array([r2_score(y[:, target], preds[:, k]) for k in range(end - start)])
+        # Require every larger count to stay within budget too, so a lucky
+        # dip in the curve is not picked
+        within = np.logical_and.accumulate((scores >= baseline_r2[target] - max_drop)[::-1])[::-1]
+        counts.append(int(np.argmax(within)) + 1 if within.any() else None)
+    return counts
+
+def search(forest, X, y, max_drop):
+    """(trees per target, max_depth) of the smallest forest meeting the budget on X, y."""
+    # A drop of at most max_drop on every target keeps the averaged R2 within budget too
+    baseline_r2 = per_target_r2(forest, X, y)
+    full = [int(n) for n in np.diff(forest.tree_offsets)]
+    best = (full, None, forest.n_nodes)
+
+    for max_depth in depth_grid:
+        cut = forest.compact(full, max_depth=max_depth)
+        counts = fewest_trees(cut, X, y, baseline_r2, max_drop)
+        if None in counts:
+            # Shallower cuts generally lose more accuracy still
+            break
+        n_nodes = forest.compact(counts, max_depth=max_depth).n_nodes
+        print(f"  max_depth {str(max_depth):>4s}: trees {counts} -> {n_nodes} nodes")
+        if n_nodes < best[2]:
+            best = (counts, max_depth, n_nodes)
+    return best[0], best[1]
+
+def latency_ms(forest, X, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        forest.predict(X)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1e3
+
+def report(name, forest, X_report, y_report, X_batch):
+    r2 = r2_score(y_report, forest.predict(X_report))
+    return {
+        "model": name,
+        "trees": forest.n_trees,
+        "nodes": forest.n_nodes,
+        "size_mb": forest.nbytes / 1e6,
+        "r2": float(r2),
+        "single_row_ms": latency_ms(forest, X_batch[:1], 50),
+        "batch_ms": latency_ms(forest, X_batch, 5)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact the exported forest within an R2 budget.")
+    parser.add_argument("--max-r2-drop", type=float, default=0.01, help="largest acceptable drop in held-out R2")
+    parser.add_argument("--input", default=artifacts.version_paths(artifacts.current_version())["forest"],
+                        help="exported forest to compact (default: the current model version)")
+    parser.add_argument("--output", default=os.path.join(artifacts.current_dir, "SocioDemoRFModel.compact.forest"))
+    parser.add_argument("--publish", action="store_true",
+                        help="also publish the compacted forest as a new model version and make it current")
+    parser.add_argument("--batch-rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    forest = CompiledForest.load(args.input)
+    X, y, _ = load_dataset()
+    # Same split as SocioDemoRF, then halve the held-out rows
+    _, X_test, _, Y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_select, X_report, y_select, y_report = train_test_split(
+        X_test.to_numpy(), Y_test.to_numpy(), test_size=0.5, random_state=0)
+
+    print(f"Searching for the smallest forest within an R2 drop of {args.max_r2_drop}")
+    trees_per_target, max_depth = search(forest, X_select, y_select, args.max_r2_drop)
+    compacted = forest.compact(trees_per_target, max_depth=max_depth)
+    compacted.save(args.output)
+    compaction = {"source": os.path.abspath(args.input), "trees_per_target": trees_per_target,
+                  "max_depth": max_depth, "max_r2_drop": args.max_r2_drop}
+    with open(os.path.join(args.output, "compaction.json"), "w") as f:
+        json.dump(compaction, f, indent=2)
+
+    X_batch = np.resize(X.to_numpy(), (args.batch_rows, X.shape[1]))
+    before = report("full", forest, X_report, y_report, X_batch)
+    after = report("compact", compacted, X_report, y_report, X_batch)
+
+    print(f"\nKept trees per target {trees_per_target}, max_depth {max_depth}; written to {args.output}")
+    print(f"{'model':8s} {'trees':>6s} {'nodes':>8s} {'size':>9s} {'R2':>7s} {'1 row':>9s} {f'{args.batch_rows} rows':>11s}")
+    for row in (before, after):
+        print(f"{row['model']:8s} {row['trees']:6d} {row['nodes']:8d} {row['size_mb']:7.2f}MB {row['r2']:7.4f} "
+              f"{row['single_row_ms']:7.2f}ms {row['batch_ms']:9.1f}ms")
+    print(f"R2 change on the report half: {after['r2'] - before['r2']:+.4f} (budget -{args.max_r2_drop})")
+
+    if args.publish:
+        # The source version's manifest, with the compaction and its accuracy
+        source_manifest = os.path.join(os.path.dirname(args.input), "manifest.json")
+        with open(source_manifest if os.path.exists(source_manifest) else artifacts.legacy_paths["manifest"]) as f:
+            manifest = json.load(f)
+        manifest = dict(manifest, compaction=compaction, source_version=manifest.get("version"),
+                        metrics=dict(manifest.get("metrics", {}), report_half_r2=after["r2"]))
+        version = artifacts.publish(compacted, manifest)
+        print(f"Published as model version {version}")
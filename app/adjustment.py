@@ -1,3 +1,9 @@
+import logging
+import numpy as np
+from app.ingest import ingest
+
+logger = logging.getLogger(__name__)
+
 def generate_adjustment_message(category_label, actual, previous_prediction, current_prediction, adjusted, confidence):
     forecast_error = previous_prediction - actual
     error_percent = (abs(forecast_error) / previous_prediction * 100) if previous_prediction != 0 else 0
@@ -53,102 +59,106 @@ def generate_adjustment_message(category_label, actual, previous_prediction, cur
             )
 
 
-def budget_adjustment(data_json, previous_forecast=None, current_forecast=None):
-    import pandas as pd
-
-    try:
-        # 1. Convert input expense data into a DataFrame
-        df = pd.DataFrame(data_json)
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values(by='date').reset_index(drop=True)
-
-        # 2. Filter only expenses
-        df = df[df['type'] == 'Expense']
-
-        # 3. Get the most recent previous month
-        latest_date = df['date'].max()
-        previous_month = (latest_date - pd.DateOffset(months=1)).month
-        previous_month_year = (latest_date - pd.DateOffset(months=1)).year
-        prev_month_df = df[(df['date'].dt.month == previous_month + 1) & 
-                           (df['date'].dt.year == previous_month_year)]
-        
-        print("ACTUAL EXPENSE FOR MONTH OF ", previous_month + 1)
-
-        # 4. Group by category and sum the totalAmount
-        grouped = prev_month_df.groupby('category')['totalAmount'].sum().reset_index()
-
-        print("GROUPED DATASET: ", grouped) 
-
-        # 5. Define mapping between forecast keys and actual categories
-        category_map = {
-            "Living_Expenses": "living_expenses",
-            "Food_and_Dining_Expenses": "food_and_dining_expenses",
-            "Transportation_Expenses": "transportation_expenses",
-            "Leisure_and_Entertainment_Expenses": "leisure_and_entertainment_expenses",
-            "Academic_Expenses": "academic_expenses"
-        }
-
-        category_actual = {
-            "Living_Expenses": "Living",
-            "Food_and_Dining_Expenses": "Food and Dining",
-            "Transportation_Expenses": "Transportation",
-            "Leisure_and_Entertainment_Expenses": "Leisure and Entertainment",
-            "Academic_Expenses": "Academic"
-        }
-
-        # 6. Create a dictionary of actuals for easy access
-        actuals = dict(zip(grouped['category'], grouped['totalAmount']))
-
-        print("Actuals: ", actuals)
-
-        confidence_scores = {}
-        adjusted_predictions = {}
-        personalized_messages = {}
-
-
-        # 7. Calculate confidence and adjusted prediction
-        for category, forecast_key in category_map.items():
-            actual = actuals.get(category_actual[category], 0)
-            previous_prediction = getattr(previous_forecast, forecast_key, 0)
-            current_prediction = current_forecast.get(category, 0)
-
-            if previous_prediction == 0:
-                confidence = 0
-            else:
-                confidence = max(0, 1 - (abs(actual - previous_prediction) / previous_prediction))
-
-            adjusted = (confidence * current_prediction) + ((1 - confidence) * actual)
-
-            confidence_scores[category] = confidence
-            adjusted_predictions[category] = adjusted
-
-            # Generate the message
-            message = generate_adjustment_message(
-                category_label=category_actual[category],
+# RF category -> (previous_forecast field, transaction category), in output order
+category_map = {
+    "Living_Expenses": ("living_expenses", "Living"),
+    "Food_and_Dining_Expenses": ("food_and_dining_expenses", "Food and Dining"),
+    "Transportation_Expenses": ("transportation_expenses", "Transportation"),
+    "Leisure_and_Entertainment_Expenses": ("leisure_and_entertainment_expenses", "Leisure and Entertainment"),
+    "Academic_Expenses": ("academic_expenses", "Academic")
+}
+categories = list(category_map)
+
+def last_month_actuals(data_json):
+    """Expense totals by category (in `categories` order) of the month the adjustment compares against."""
+    # 1-2. Parse the expense transactions, unless the caller already ingested them
+    transactions = ingest(data_json)
+
+    # 3. Get the most recent previous month (the month and year of latest_date - 1 month)
+    latest_date = transactions.latest_date
+    if latest_date.month > 1:
+        previous_month_year, previous_month = latest_date.year, latest_date.month - 1
+    else:
+        previous_month_year, previous_month = latest_date.year - 1, 12
+
+    logger.debug("event=actual_expense_month month=%s", previous_month + 1)
+
+    # 4. Expense totals by category for that month
+    actuals = transactions.month_totals(previous_month_year, previous_month + 1)
+    logger.debug("event=actuals actuals=%s", actuals)
+    return np.array([actuals.get(label, 0) for _, label in category_map.values()], dtype=np.float64)
+
+def previous_matrix(previous_forecasts):
+    """(n_users, n_categories) fields of PreviousCategoryPrediction objects; 0 for a missing forecast."""
+    return np.array([[getattr(forecast, field, 0) for field, _ in category_map.values()]
+                     for forecast in previous_forecasts], dtype=np.float64).reshape(-1, len(categories))
+
+def current_matrix(current_forecasts):
+    """(n_users, n_categories) values of this month's forecast dicts, keyed by RF category."""
+    return np.array([[forecast.get(category, 0) for category in categories]
+                     for forecast in current_forecasts], dtype=np.float64).reshape(-1, len(categories))
+
+class Adjustment:
+    """
+    Budget adjustment of a users x categories matrix at once.
+
+    actual, previous and current are arrays of the same shape: last month's
+    expenses, last month's forecast and this month's forecast, one column
+    per category of `categories`. A category's confidence is how close its
+    forecast came to the actual amount; the adjusted prediction moves this
+    month's forecast towards the actual amount as confidence drops.
+    Messages are only rendered when messages() is called.
+    """
+
+    def __init__(self, actual, previous, current):
+        self.actual = np.asarray(actual, dtype=np.float64)
+        self.previous = np.asarray(previous, dtype=np.float64)
+        self.current = np.asarray(current, dtype=np.float64)
+
+        # 6. Calculate confidence and adjusted prediction; no confidence
+        # where there was no previous forecast or it was off by 100% or more
+        with np.errstate(divide="ignore", invalid="ignore"):
+            confidence = 1 - (np.abs(self.actual - self.previous) / self.previous)
+        self.confidence = np.where((self.previous != 0) & (confidence > 0), confidence, 0.0)
+        self.adjusted = (self.confidence * self.current) + ((1 - self.confidence) * self.actual)
+
+    def messages(self, row=0):
+        """Personalized message per category for one user (row of the matrix)."""
+        values = [np.atleast_2d(array)[row] for array in (self.actual, self.previous, self.current, self.adjusted, self.confidence)]
+        return {
+            category: generate_adjustment_message(
+                category_label=category_map[category][1],
                 actual=actual,
                 previous_prediction=previous_prediction,
                 current_prediction=current_prediction,
                 adjusted=adjusted,
                 confidence=confidence
             )
+            for category, actual, previous_prediction, current_prediction, adjusted, confidence in zip(categories, *values)
+        }
 
-            personalized_messages[category] = message
-
+def budget_adjustment(data_json, previous_forecast=None, current_forecast=None):
+    try:
+        adjustment = Adjustment(
+            last_month_actuals(data_json),
+            previous_matrix([previous_forecast])[0],
+            current_matrix([current_forecast])[0]
+        )
+        confidence_scores = dict(zip(categories, adjustment.confidence.tolist()))
+        adjusted_predictions = dict(zip(categories, adjustment.adjusted.tolist()))
 
-        print(confidence_scores)
-        print(adjusted_predictions)
+        logger.debug("event=adjusted confidence=%s adjusted=%s", confidence_scores, adjusted_predictions)
 
         return {
             "success": True,
             "confidence_scores": confidence_scores,
             "adjusted_predictions": adjusted_predictions,
-            "messages": personalized_messages
+            "messages": adjustment.messages()
         }
 
 
     except Exception as e:
-        print("Adjusting error:", e)
+        logger.warning("event=adjustment_failed error=%s", e)
         return {
             "success": False
         }
-
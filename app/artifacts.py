@@ -0,0 +1,275 @@
+import argparse
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+import time
+import pandas as pd
+from app.encoder import FeatureEncoder
+from app.forest import CompiledForest
+
+logger = logging.getLogger(__name__)
+
+# Versioned model artifacts. Every training run writes a directory
+#   <MODEL_DIR>/<version>/{manifest.json, model.pkl, forest/}
+# and then points <MODEL_DIR>/CURRENT at it. Servers poll CURRENT and swap the
+# new version in once it is loaded and warm. A tree without CURRENT falls back
+# to the single unversioned export SocioDemoRF used to write; publish that
+# export as a version, without retraining, with
+#   python -m app.artifacts import-legacy
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+models_dir = os.environ.get("MODEL_DIR", os.path.join(current_dir, "models"))
+
+legacy_paths = {
+    "model": os.path.join(current_dir, "SocioDemoRFModel.pkl"),
+    "forest": os.path.join(current_dir, "SocioDemoRFModel.forest"),
+    "manifest": os.path.join(current_dir, "SocioDemoRFModel.schema.json")
+}
+
+training_csv = os.path.join(os.path.dirname(current_dir), "dataset", "Student-Spending-Habits_PreProcessed.csv")
+
+def training_csv_columns():
+    # Feature columns of artifacts exported before the schema manifest existed
+    return pd.read_csv(training_csv, nrows=0).drop(columns=[
+        "Living_Expenses", "Food_and_Dining_Expenses",
+        "Transportation_Expenses", "Leisure_and_Entertainment_Expenses",
+        "Academic_Expenses"
+    ]).columns.tolist()
+
+def version_paths(version):
+    if version is None:
+        return legacy_paths
+    if os.path.basename(version) != version or version.startswith("."):
+        raise ValueError(f"invalid model version {version!r}")
+    root = os.path.join(models_dir, version)
+    return {
+        "model": os.path.join(root, "model.pkl"),
+        "forest": os.path.join(root, "forest"),
+        "manifest": os.path.join(root, "manifest.json")
+    }
+
+def current_version():
+    """Version CURRENT points at, or None when there are no versioned artifacts."""
+    try:
+        with open(os.path.join(models_dir, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def set_current(version):
+    # Readers see either the old or the new pointer, never a partial write
+    pointer = os.path.join(models_dir, "CURRENT")
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version + "\n")
+    os.replace(pointer + ".tmp", pointer)
+
+def publish(forest, manifest, model=None):
+    """
+    Write a new version (the pickled model is optional) and make it current.
+    The files are written to a temporary directory that is renamed into
+    place, so a server never sees a partly written version.
+    """
+    version = time.strftime("%Y%m%dT%H%M%S") + "-" + forest.fingerprint()[:8]
+    paths = version_paths(version)
+    staging = os.path.join(models_dir, f".{version}.tmp")
+    os.makedirs(staging, exist_ok=True)
+
+    forest.save(os.path.join(staging, "forest"))
+    if model is not None:
+        with open(os.path.join(staging, "model.pkl"), "wb") as f:
+            pickle.dump(model, f)
+    with open(os.path.join(staging, "manifest.json"), "w") as f:
+        json.dump(dict(manifest, version=version, created_at=time.strftime("%Y-%m-%dT%H:%M:%S%z")), f, indent=2)
+
+    shutil.rmtree(os.path.dirname(paths["manifest"]), ignore_errors=True)
+    os.rename(staging, os.path.dirname(paths["manifest"]))
+    set_current(version)
+    return version
+
+class LoadedModel:
+    """One model version ready to serve: its forest, feature encoder and manifest."""
+
+    def __init__(self, version, forest, encoder, fields, manifest, load_seconds):
+        self.version = version
+        self.forest = forest
+        self.encoder = encoder
+        self.fields = list(fields)
+        self.manifest = manifest
+        self.load_seconds = load_seconds
+        self.warm_up_seconds = None
+        self.loaded_at = time.time()
+        # Identifies the served model in cache keys, whatever the version is called
+        self.fingerprint = forest.fingerprint()
+
+    @classmethod
+    def load(cls, version, load_mode, fields, fallback_columns=None):
+        """
+        Load a version (None for the legacy export). load_mode "mmap" maps the
+        forest's node arrays; "pickle", or a version without the export,
+        compiles the forest from the pickled model in private memory.
+        """
+        start = time.perf_counter()
+        paths = version_paths(version)
+        if load_mode == "mmap" and os.path.isdir(paths["forest"]):
+            forest = CompiledForest.load(paths["forest"], mmap_mode='r')
+        else:
+            if load_mode == "mmap":
+                logger.warning("event=forest_export_missing path=%s fallback=pickle", paths["forest"])
+            if os.path.exists(paths["model"]):
+                with open(paths["model"], 'rb') as f:
+                    forest = CompiledForest.from_estimator(pickle.load(f))
+            else:
+                forest = CompiledForest.load(paths["forest"])
+
+        if os.path.exists(paths["manifest"]):
+            with open(paths["manifest"]) as f:
+                manifest = json.load(f)
+        else:
+            # Older artifacts fall back to the header of the training CSV
+            manifest = {"feature_columns": fallback_columns()}
+
+        encoder = FeatureEncoder(manifest["feature_columns"], fields)
+        return cls(version or "legacy", forest, encoder, fields, manifest, time.perf_counter() - start)
+
+    def warm_up(self):
+        # Touch the model pages and first-call code paths before serving
+        start = time.perf_counter()
+        self.forest.warm_up()
+        self.forest.predict(self.encoder.encode_many([{field: "" for field in self.fields}]))
+        self.warm_up_seconds = time.perf_counter() - start
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "fingerprint": self.fingerprint,
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.loaded_at)),
+            "load_seconds": self.load_seconds,
+            "warm_up_seconds": self.warm_up_seconds,
+            "trees": self.forest.n_trees,
+            "nodes": self.forest.n_nodes,
+            "manifest": {key: value for key, value in self.manifest.items() if key != "feature_columns"}
+        }
+
+class ModelManager:
+    """
+    Holds the active LoadedModel and replaces it when CURRENT changes.
+
+    A new version is loaded and warmed in the background while the old one
+    keeps serving, then swapped in with a single attribute assignment.
+    Requests read `active` once and use that model throughout, so in-flight
+    requests finish on the version they started with. Each uvicorn worker
+    runs its own manager and picks up the new version on its next poll.
+    """
+
+    def __init__(self, load_mode, fields, fallback_columns=None, poll_interval=30.0):
+        self.load_mode = load_mode
+        self.fields = fields
+        self.fallback_columns = fallback_columns
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.failed_version = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.active = LoadedModel.load(current_version(), load_mode, fields, fallback_columns)
+
+    def reload(self, force=False):
+        """
+        Load and warm the version CURRENT points at and swap it in. A version
+        that failed to load is only retried with force. Returns True if the
+        active model changed.
+        """
+        with self.lock:
+            version = current_version()
+            if version is None or version == self.active.version:
+                return False
+            if version == self.failed_version and not force:
+                return False
+            try:
+                model = LoadedModel.load(version, self.load_mode, self.fields, self.fallback_columns)
+                model.warm_up()
+            except Exception as e:
+                # Keep serving the active version
+                self.failures += 1
+                self.failed_version = version
+                self.last_error = f"{version}: {e}"
+                logger.warning("event=model_reload_failed version=%s error=%s", version, e)
+                return False
+
+            previous, self.active = self.active, model
+            self.reloads += 1
+            self.failed_version = self.last_error = None
+            logger.info("event=model_reloaded version=%s previous=%s load_seconds=%.3f warm_up_seconds=%.3f",
+                        model.version, previous.version, model.load_seconds, model.warm_up_seconds)
+            return True
+
+    def _poll(self):
+        while not self.stopped.wait(self.poll_interval):
+            self.reload()
+
+    def start(self):
+        if self.poll_interval > 0 and self.thread is None:
+            self.thread = threading.Thread(target=self._poll, name="model-reload", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def describe(self):
+        return {
+            "active": self.active.describe(),
+            "current": current_version(),
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "poll_interval": self.poll_interval
+        }
+
+def manager_from_env(fields, fallback_columns=None):
+    """ModelManager configured by MODEL_LOAD_MODE and MODEL_RELOAD_INTERVAL (seconds, 0 disables polling)."""
+    load_mode = os.environ.get("MODEL_LOAD_MODE", "mmap")
+    if load_mode not in ("mmap", "pickle"):
+        raise ValueError(f"MODEL_LOAD_MODE must be 'mmap' or 'pickle', not {load_mode!r}")
+    poll_interval = float(os.environ.get("MODEL_RELOAD_INTERVAL", 30))
+    return ModelManager(load_mode, fields, fallback_columns, poll_interval)
+
+def import_legacy():
+    """
+    Publish the unversioned export as a version and make it current, so the
+    model it holds keeps serving once CURRENT exists. The feature columns
+    come from its schema file, or from the pickled model's feature names.
+    """
+    model = None
+    if os.path.exists(legacy_paths["model"]):
+        with open(legacy_paths["model"], 'rb') as f:
+            model = pickle.load(f)
+    if os.path.isdir(legacy_paths["forest"]):
+        forest = CompiledForest.load(legacy_paths["forest"])
+    elif model is not None:
+        forest = CompiledForest.from_estimator(model)
+    else:
+        raise FileNotFoundError(f"no legacy export at {legacy_paths['model']} or {legacy_paths['forest']}")
+
+    if os.path.exists(legacy_paths["manifest"]):
+        with open(legacy_paths["manifest"]) as f:
+            manifest = json.load(f)
+    elif forest.feature_names is not None:
+        manifest = {"feature_columns": forest.feature_names}
+    else:
+        raise ValueError(f"{legacy_paths['model']} has no feature names; add {legacy_paths['manifest']} first")
+
+    return publish(forest, dict(manifest, imported_from=os.path.relpath(legacy_paths["model"], current_dir)), model)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the versioned model artifacts.")
+    parser.add_argument("command", choices=["import-legacy"],
+                        help="import-legacy: publish the unversioned SocioDemoRFModel export as the current version")
+    args = parser.parse_args()
+
+    version = import_legacy()
+    print(f"Model version {version} written to {models_dir} and made current")
@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+from app import Exponential
+from app.artifacts import LoadedModel, current_version, training_csv_columns
+from app.ingest import Transactions
+from app.prediction import CombinedInput, PreviousForecast, UserInput, build_prediction, rf_categories
+
+# Run from the repository root, e.g.
+#   python -m app.bulkScore --profiles dataset/synthetic_transactions_profiles.parquet \
+#       --transactions dataset/synthetic_transactions.parquet --output budgets.jsonl
+#
+# Next-month budgets for every student without going through HTTP. Profiles
+# are rows in the Student-Spending-Habits.csv schema with a userId column
+# (without one, users are numbered by row); transactions are rows in the
+# realistic_student_transactions_*.csv schema with a userId column, like the
+# files app/generateDummyData.py writes. Each chunk of users goes to a worker
+# process, which runs the /predict pipeline for it: encode -> RF -> ES ->
+# budget_adjustment -> allowance rescale (prediction.build_prediction). Every
+# worker loads the model version CURRENT pointed at when the run started once,
+# as the server does (MODEL_LOAD_MODE), and the RF is one forest pass per
+# chunk. By default each user's forecast is the same forecast_expenses call
+# /predict makes, so the budgets equal what /predict returns; --es batch fits
+# a chunk's long histories together in Exponential.forecast_batch instead,
+# which is faster but gives different (batched NumPy Holt-Winters) forecasts.
+#
+# Results are appended as chunks finish, in completion order: one JSON object
+# per line, or one Parquet part file per chunk in the --output directory.
+# Users already in the output are skipped, so an interrupted run continues
+# where it stopped when started again with the same arguments. Users whose
+# profile or prediction fails get a row with an "error" instead.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def read_table(path, **kwargs):
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path, **kwargs)
+
+# The model this process scores with
+_model = None
+
+def load_model(version):
+    """Load a model version (None for the legacy export) for this process to score with."""
+    global _model
+    _model = LoadedModel.load(version, os.environ.get("MODEL_LOAD_MODE", "mmap"),
+                              UserInput.model_fields, fallback_columns=training_csv_columns)
+    return _model
+
+def score_chunk(profiles, transactions, previous_forecasts, es="per-user"):
+    """
+    Output rows for a chunk of users: their profile dicts (with userId), their
+    transaction rows and their previous forecast dicts by userId.
+    """
+    model = _model or load_model(current_version())
+    rows = []
+    items, user_ids = [], []
+    for profile in profiles:
+        try:
+            previous = previous_forecasts.get(profile["userId"])
+            items.append(CombinedInput(
+                user_data=UserInput(**{field: profile[field] for field in UserInput.model_fields}),
+                previous_forecast=PreviousForecast(**previous) if previous else None
+            ))
+            user_ids.append(profile["userId"])
+        except (KeyError, ValidationError) as e:
+            rows.append({"userId": profile["userId"], "error": str(e)})
+    if not items:
+        return rows
+
+    # One forest pass for the chunk
+    rf_preds = model.forest.predict(model.encoder.encode_many([item.user_data.model_dump() for item in items]))
+
+    # Parse each user's transactions once for ES and the budget adjustment, as
+    # ingest_transactions does, straight from their rows of the chunk's frame
+    by_user = dict(list(transactions.groupby("userId", sort=False)))
+    ingested = []
+    for user_id in user_ids:
+        if user_id not in by_user:
+            ingested.append(None)
+            continue
+        try:
+            ingested.append(Transactions.from_frame(by_user[user_id].reset_index(drop=True)))
+        except Exception:
+            # Leave malformed transactions for each stage to report
+            ingested.append(by_user[user_id].to_dict("records"))
+
+    previous = [item.previous_forecast for item in items]
+    if es == "batch":
+        es_predictions = Exponential.forecast_batch(ingested, previous)
+    else:
+        es_predictions = [Exponential.forecast_expenses(txns, prev) for txns, prev in zip(ingested, previous)]
+
+    for user_id, item, preds, txns, es_prediction in zip(user_ids, items, rf_preds, ingested, es_predictions):
+        try:
+            rows.append(dict(userId=user_id, **build_prediction(item, preds, txns, es_prediction, endpoint="bulk")))
+        except Exception as e:
+            rows.append({"userId": user_id, "error": str(e)})
+    return rows
+
+class JsonlOutput:
+    """Appends result rows to a JSON Lines file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def completed(self):
+        """userIds already written. A line cut off by an interruption is removed."""
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                f.truncate(end)
+        return {json.loads(line)["userId"] for line in data[:end].splitlines() if line.strip()}
+
+    def write(self, rows):
+        with open(self.path, "a") as f:
+            f.writelines(json.dumps(row, default=str) + "\n" for row in rows)
+
+class ParquetOutput:
+    """
+    Writes each chunk's rows as a Parquet part file in a directory; needs
+    pyarrow. Parts are renamed into place once written, so an interrupted
+    run leaves no partial part behind.
+    """
+
+    def __init__(self, path):
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pq = pyarrow.parquet
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.parts = len(self.part_files())
+
+    def part_files(self):
+        return sorted(name for name in os.listdir(self.path) if name.startswith("part-") and name.endswith(".parquet"))
+
+    def completed(self):
+        done = set()
+        for name in self.part_files():
+            done.update(self.pq.read_table(os.path.join(self.path, name), columns=["userId"]).column(0).to_pylist())
+        return done
+
+    @staticmethod
+    def flatten(row):
+        es_prediction = row.get("es_prediction") or {}
+        flat = {
+            "userId": row["userId"],
+            "error": row.get("error"),
+            "prediction_exceed": row.get("prediction_exceed"),
+            "es_success": row.get("es_success"),
+            "es_message": row.get("es_message"),
+            "combined_total": row.get("combined_total"),
+            "rf_total": row.get("rf_total"),
+            "es_r2_score": row.get("es_r2_score"),
+            "es_total": es_prediction.get("metrics", {}).get("total_forecasted"),
+            "engine": es_prediction.get("metrics", {}).get("engine")
+        }
+        categories = row.get("categories") or {}
+        for category in rf_categories:
+            flat[category] = categories.get(category)
+        flat["adjustment_info"] = json.dumps(row["adjustment_info"]) if "adjustment_info" in row else None
+        return flat
+
+    def write(self, rows):
+        df = pd.DataFrame([self.flatten(row) for row in rows])
+        name = f"part-{self.parts:05d}.parquet"
+        staging = os.path.join(self.path, f".{name}.tmp")
+        df.to_parquet(staging, index=False)
+        os.replace(staging, os.path.join(self.path, name))
+        self.parts += 1
+
+def load_previous_forecasts(path):
+    """PreviousForecast objects by userId, one JSON object per line."""
+    if not path:
+        return {}
+    with open(path) as f:
+        forecasts = [json.loads(line) for line in f if line.strip()]
+    return {forecast["userId"]: forecast for forecast in forecasts}
+
+def chunks(profiles, transactions, previous_forecasts, chunk_users):
+    """(profile dicts, transaction rows, previous forecasts) for chunk_users users at a time."""
+    rows_by_user = transactions.groupby("userId", sort=False).indices
+    for first in range(0, len(profiles), chunk_users):
+        chunk = profiles.iloc[first:first + chunk_users]
+        user_ids = chunk["userId"].tolist()
+        positions = [rows_by_user[user_id] for user_id in user_ids if user_id in rows_by_user]
+        yield (
+            chunk.to_dict("records"),
+            transactions.iloc[np.concatenate(positions) if positions else []],
+            {user_id: previous_forecasts[user_id] for user_id in user_ids if user_id in previous_forecasts}
+        )
+
+def score(profiles, transactions, previous_forecasts, output, chunk_users=500, workers=0, es="per-user", version=None):
+    """
+    Score every profile not in output yet with a model version (None for the
+    legacy export), reporting progress per chunk. Returns (users, errors).
+    """
+    done = output.completed()
+    todo = profiles[~profiles["userId"].isin(done)]
+    if done:
+        print(f"Resuming: {len(profiles) - len(todo)} of {len(profiles)} users already scored")
+    if todo.empty:
+        return 0, 0
+
+    scored = errors = 0
+    start = time.perf_counter()
+
+    def finish(rows):
+        nonlocal scored, errors
+        output.write(rows)
+        scored += len(rows)
+        errors += sum("error" in row for row in rows)
+        rate = scored / (time.perf_counter() - start)
+        print(f"{scored}/{len(todo)} users ({errors} errors), {rate:,.1f} users/s", flush=True)
+
+    work = chunks(todo, transactions, previous_forecasts, chunk_users)
+    if workers <= 0:
+        load_model(version)
+        for profile_rows, transaction_rows, previous in work:
+            finish(score_chunk(profile_rows, transaction_rows, previous, es))
+        return scored, errors
+
+    # spawn like the server's forecast pool; at most two chunks per worker
+    # are pending, so memory stays bounded by the chunk size
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                             initializer=load_model, initargs=(version,)) as executor:
+        pending = set()
+        for profile_rows, transaction_rows, previous in work:
+            pending.add(executor.submit(score_chunk, profile_rows, transaction_rows, previous, es))
+            if len(pending) >= 2 * workers:
+                completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    finish(future.result())
+        for future in wait(pending).done:
+            finish(future.result())
+    return scored, errors
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Score next-month budgets for every student in a profiles file.")
+    parser.add_argument("--profiles", default=os.path.join(BASE_DIR, "dataset", "synthetic_transactions_profiles.csv"),
+                        help="profiles in the Student-Spending-Habits.csv schema, plus userId")
+    parser.add_argument("--transactions", default=os.path.join(BASE_DIR, "dataset", "synthetic_transactions.csv"),
+                        help="transactions in the realistic_student_transactions_*.csv schema, plus userId")
+    parser.add_argument("--previous-forecasts", help="JSON Lines file of /predict previous_forecast objects")
+    parser.add_argument("--output", default="budgets.jsonl", help="JSON Lines file, or a directory of Parquet parts")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], help="defaults to the output file extension")
+    parser.add_argument("--chunk-users", type=int, default=500, help="users scored per task")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (0 scores inline)")
+    parser.add_argument("--es", choices=["per-user", "batch"], default="per-user",
+                        help="one forecast_expenses call per user as /predict makes, or fit a chunk's forecasts together")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    file_format = args.format or ("parquet" if args.output.endswith(".parquet") else "jsonl")
+    output = ParquetOutput(args.output) if file_format == "parquet" else JsonlOutput(args.output)
+
+    profiles = read_table(args.profiles, dtype=str, keep_default_na=False)
+    if "userId" not in profiles.columns:
+        profiles.insert(0, "userId", [str(i) for i in range(len(profiles))])
+    profiles["userId"] = profiles["userId"].astype(str)
+    transactions = read_table(args.transactions, dtype={"userId": str})
+    if "userId" not in transactions.columns:
+        raise SystemExit(f"{args.transactions} has no userId column to match transactions to profiles")
+    transactions["userId"] = transactions["userId"].astype(str)
+
+    version = current_version()
+    start = time.perf_counter()
+    users, errors = score(profiles, transactions, load_previous_forecasts(args.previous_forecasts), output,
+                          chunk_users=args.chunk_users, workers=args.workers, es=args.es, version=version)
+    elapsed = time.perf_counter() - start
+    print(f"{users} users scored ({errors} errors) in {elapsed:.1f}s ({users / elapsed:,.1f} users/s) "
+          f"with model {version or 'legacy'}")
+    print(f"Output: {args.output}")
@@ -0,0 +1,282 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+class MemoryBackend:
+    """In-process LRU store; entries are kept in least- to most-recently used order."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, stored_at):
+        with self.lock:
+            self.entries[key] = (value, stored_at)
+            self.entries.move_to_end(key)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def evict(self, max_entries):
+        evicted = 0
+        with self.lock:
+            while len(self.entries) > max_entries:
+                self.entries.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+class SQLiteBackend:
+    """
+    LRU store in a local SQLite file, shared by every process that opens it.
+    Values must be JSON serializable. The lookup counters are kept in the
+    file too, so they cover every process using it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per call keeps the backend safe across threads
+        # and workers. sqlite3's own context manager only commits, so close it here
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, stored_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), stored_at, time.time())
+            )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def evict(self, max_entries):
+        with self._connect() as conn:
+            excess = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - max_entries
+            if excess <= 0:
+                return 0
+            cursor = conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (excess,)
+            )
+            return cursor.rowcount
+
+    def add_counts(self, counts):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                counts.items()
+            )
+
+    def counts(self):
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT name, value FROM counters").fetchall())
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache")
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire ttl seconds after they are stored.
+
+    Storage is delegated to a backend (MemoryBackend or SQLiteBackend) so the
+    same cache can be kept per process or shared between uvicorn workers.
+    A max_entries of 0 disables caching.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, backend=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+
+        entry = self.backend.get(key)
+        if entry is None:
+            self._count(misses=1)
+            return None
+
+        value, stored_at = entry
+        if self.ttl is not None and time.time() - stored_at > self.ttl:
+            self.backend.delete(key)
+            self._count(expirations=1, misses=1)
+            return None
+
+        self._count(hits=1)
+        return value
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        self.backend.set(key, value, time.time())
+        evicted = self.backend.evict(self.max_entries)
+        if evicted:
+            self._count(evictions=evicted)
+
+    def _count(self, **counts):
+        with self.lock:
+            for name, amount in counts.items():
+                setattr(self, name, getattr(self, name) + amount)
+        # A shared backend also keeps the totals of every process using it
+        if hasattr(self.backend, "add_counts"):
+            self.backend.add_counts(counts)
+
+    def totals(self):
+        """Lookup counters: this process's, or those of every process sharing the backend."""
+        counts = {name: getattr(self, name) for name in ("hits", "misses", "evictions", "expirations")}
+        if hasattr(self.backend, "counts"):
+            counts = dict(dict.fromkeys(counts, 0), **self.backend.counts())
+        return counts
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.backend),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+class SingleFlight:
+    """
+    Shares one computation between concurrent callers with the same key.
+
+    The first caller of a key runs the function; callers arriving while it
+    runs wait and get its result (or its exception) instead of computing
+    their own. Nothing is kept once the call finishes, so a later caller
+    computes afresh. Calls are only shared within a process.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.leaders = 0
+        self.shared = 0
+        self.lock = threading.Lock()
+
+    def do(self, key, function):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {"done": threading.Event(), "result": None, "error": None}
+                self.leaders += 1
+            else:
+                self.shared += 1
+
+        if leader:
+            try:
+                call["result"] = function()
+            except BaseException as e:
+                call["error"] = e
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call["done"].set()
+        else:
+            call["done"].wait()
+
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+
+    def in_flight(self):
+        return len(self.calls)
+
+def shared_path(name):
+    """
+    Default SQLite file for a cache read by the ES stage, None when that runs
+    in a single process. Forecast pool workers and uvicorn workers
+    (WEB_CONCURRENCY) each have their own memory, so an in-memory cache
+    would be split between them and mostly miss. The file lives in CACHE_DIR
+    (a directory under the system temp dir by default).
+    """
+    pool_size = int(os.environ.get("FORECAST_POOL_SIZE", 0))
+    web_workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    if pool_size <= 0 and web_workers <= 1:
+        return None
+    directory = os.environ.get("CACHE_DIR", os.path.join(tempfile.gettempdir(), "foresight-cache"))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{name}.sqlite")
+
+def cache_from_env(prefix, max_entries=1024, ttl=3600, default_path=None):
+    """
+    Build a TTLCache configured by <prefix>_SIZE, <prefix>_TTL and <prefix>_PATH.
+    Setting <prefix>_PATH switches to a SQLite file shared across workers;
+    default_path is used when it is not set, and an empty <prefix>_PATH keeps
+    the cache in memory.
+    """
+    max_entries = int(os.environ.get(f"{prefix}_SIZE", max_entries))
+    if os.environ.get(f"{prefix}_TTL"):
+        ttl = float(os.environ[f"{prefix}_TTL"])
+    path = os.environ.get(f"{prefix}_PATH", default_path)
+
+    backend = SQLiteBackend(path) if path and max_entries > 0 else MemoryBackend()
+    return TTLCache(max_entries=max_entries, ttl=ttl, backend=backend)
@@ -0,0 +1,57 @@
+import numpy as np
+from app.utils import convert_to_numeric, ordinal_mappings
+
+class FeatureEncoder:
+    """
+    Encodes UserInput dicts straight into rows of the RF feature matrix.
+
+    Column positions are resolved once from reference_columns, so encoding a
+    profile is a handful of dict lookups written into a preallocated NumPy
+    row instead of the DataFrame work done by preprocess_input. The output
+    matches preprocess_input value for value.
+    """
+
+    def __init__(self, reference_columns, fields):
+        self.columns = list(reference_columns)
+        self.column_index = {col: i for i, col in enumerate(self.columns)}
+
+        # Raw fields that keep a column of their own after encoding
+        self.ordinal_fields = [
+            (field, self.column_index[field], mapping)
+            for field, mapping in ordinal_mappings.items()
+            if field in self.column_index
+        ]
+        self.allowance_index = self.column_index.get("Monthly_Allowance")
+        self.yes_no_fields = [
+            (field, self.column_index[field])
+            for field in fields
+            if field in self.column_index
+            and field not in ordinal_mappings
+            and field != "Monthly_Allowance"
+        ]
+
+        # The remaining columns are get_dummies outputs. On a single row,
+        # get_dummies(drop_first=True) drops the only dummy it creates, so
+        # preprocess_input always leaves them at 0 and so does the encoder.
+
+    def encode(self, raw_input: dict) -> np.ndarray:
+        row = np.zeros(len(self.columns), dtype=np.float64)
+        self._write_row(raw_input, row)
+        return row
+
+    def encode_many(self, raw_inputs) -> np.ndarray:
+        matrix = np.zeros((len(raw_inputs), len(self.columns)), dtype=np.float64)
+        for row, raw_input in zip(matrix, raw_inputs):
+            self._write_row(raw_input, row)
+        return matrix
+
+    def _write_row(self, raw_input, row):
+        for field, index, mapping in self.ordinal_fields:
+            row[index] = mapping.get(raw_input[field], np.nan)
+
+        if self.allowance_index is not None:
+            row[self.allowance_index] = convert_to_numeric(raw_input["Monthly_Allowance"])
+
+        # Anything other than Yes/No gets one-hot encoded away and refilled with 0
+        for field, index in self.yes_no_fields:
+            row[index] = 1 if raw_input[field] == "Yes" else 0
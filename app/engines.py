@@ -0,0 +1,201 @@
+import numpy as np
+from app.smoothing import SEASONAL_PERIODS
+
+# Forecasting engines by history length. Histories with two full 30-day
+# cycles get the statsmodels Holt-Winters fit in Exponential.py; shorter ones
+# are smoothed here in NumPy instead of failing that fit: weekly Holt-Winters
+# once there are two weeks, Holt's trend from HOLT_MIN_DAYS, and simple
+# exponential smoothing below that.
+#
+# fit_batch runs the same recursions for many users at once, which the batch
+# recompute uses in place of one statsmodels fit per user.
+
+WEEKLY_PERIODS = 7
+HOLT_MIN_DAYS = 10
+
+# Trend damping of the short-history engines. A trend estimated from a few
+# weeks is noisy; damping keeps the 30-day extrapolation of it bounded
+DAMPING = 0.9
+
+alpha_grid = np.linspace(0.05, 0.95, 19)
+beta_grid = np.array([0.0, 0.05, 0.1, 0.2, 0.3])
+gamma_grid = np.array([0.0, 0.05, 0.1, 0.2, 0.3])
+
+# Parameter search of fit_batch: rounds of a 3 x 3 x 3 grid around each
+# user's best point so far, halving the spacing every round
+REFINE_ROUNDS = 3
+REFINE_STEP = 0.05
+
+# Bytes of seasonal state fit_batch keeps per block of users
+BLOCK_BYTES = 64 << 20
+
+def select_engine(n_days):
+    """Name of the engine for a history of n_days daily totals, None if it is empty."""
+    if n_days >= 2 * SEASONAL_PERIODS:
+        return "holt_winters"
+    if n_days >= 2 * WEEKLY_PERIODS:
+        return "holt_winters_weekly"
+    if n_days >= HOLT_MIN_DAYS:
+        return "holt"
+    if n_days >= 1:
+        return "ses"
+    return None
+
+def initial_state(Y, start, n_obs, seasonal_periods, trend):
+    """Level, slope and seasonal components each row of Y starts from, from its first observations."""
+    rows = np.arange(Y.shape[0])
+    if seasonal_periods > 1:
+        m = seasonal_periods
+        window = np.take_along_axis(Y, start[:, None] + np.arange(2 * m), axis=1)
+        level = window[:, :m].mean(axis=1)
+        slope = (window[:, m:].mean(axis=1) - level) / m if trend else np.zeros(len(rows))
+        return level, slope, window[:, :m] - level[:, None]
+
+    first = Y[rows, start]
+    if trend:
+        k = np.minimum(n_obs, WEEKLY_PERIODS)
+        return first, (Y[rows, start + k - 1] - first) / (k - 1), np.zeros((len(rows), 1))
+    return first, np.zeros(len(rows)), np.zeros((len(rows), 1))
+
+def smooth(Y, alpha, beta, gamma, phi, initial, start):
+    """
+    Additive (damped) smoothing recursions for every row of Y under each of
+    that row's k parameter sets (alpha, beta and gamma are (n_rows, k)). All
+    rows and parameter sets advance together, one array step per day. Days
+    before a row's first observation are NaN and leave its state untouched.
+    Returns the one-step squared error and the final level, slope and
+    seasonal components of every (row, parameter set).
+    """
+    n_rows, k = alpha.shape
+    level0, slope0, season0 = initial
+    m = season0.shape[1]
+    level = np.repeat(level0[:, None], k, axis=1)
+    slope = np.repeat(slope0[:, None], k, axis=1)
+    season = np.repeat(season0[:, None, :], k, axis=1)
+    sse = np.zeros((n_rows, k))
+    rows = np.arange(n_rows)[:, None]
+    padded = bool((start > 0).any())
+
+    for t in range(Y.shape[1]):
+        observed = Y[:, t:t + 1]
+        i = ((t - start) % m)[:, None]
+        seasonal = season[rows, np.arange(k), i]
+        error = observed - (level + phi * slope + seasonal)
+
+        new_level = alpha * (observed - seasonal) + (1 - alpha) * (level + phi * slope)
+        new_slope = beta * (new_level - level) + (1 - beta) * phi * slope
+        new_season = gamma * (observed - new_level) + (1 - gamma) * seasonal
+
+        if padded:
+            active = (t >= start)[:, None]
+            error = np.where(active, error, 0.0)
+            new_level = np.where(active, new_level, level)
+            new_slope = np.where(active, new_slope, slope)
+            new_season = np.where(active, new_season, seasonal)
+
+        sse += error ** 2
+        season[rows, np.arange(k), i] = new_season
+        level, slope = new_level, new_slope
+
+    return sse, level, slope, season
+
+def parameter_grid(n_rows, seasonal_periods, trend):
+    betas = beta_grid if trend else np.zeros(1)
+    gammas = gamma_grid if seasonal_periods > 1 else np.zeros(1)
+    return [
+        np.broadcast_to(grid.ravel(), (n_rows, grid.size))
+        for grid in np.meshgrid(alpha_grid, betas, gammas, indexing="ij")
+    ]
+
+def refined_grid(centers, step, seasonal_periods, trend):
+    """3 x 3 x 3 points around each row's (alpha, beta, gamma), clipped to [0, 1]."""
+    offsets = np.array([-step, 0.0, step])
+    steps = [offsets, offsets if trend else np.zeros(1), offsets if seasonal_periods > 1 else np.zeros(1)]
+    grids = np.meshgrid(*steps, indexing="ij")
+    return [np.clip(center[:, None] + grid.ravel()[None, :], 0.0, 1.0) for center, grid in zip(centers, grids)]
+
+def fit_batch(Y, seasonal_periods=SEASONAL_PERIODS, trend=True, phi=1.0, refine_rounds=REFINE_ROUNDS):
+    """
+    Fit additive Holt-Winters to every row of Y (n_users, n_days), one
+    user's daily totals per row, right-aligned: shorter histories are
+    padded with NaN before their first day. Each row needs two full seasonal
+    cycles. The smoothing parameters come from the shared grid and then
+    refine_rounds rounds of a finer grid around each user's best point.
+    Returns arrays with one entry (or row) per user.
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+    observed = ~np.isnan(Y)
+    start = np.argmax(observed, axis=1)
+    n_obs = observed.sum(axis=1)
+    if (n_obs != Y.shape[1] - start).any():
+        raise ValueError("histories must be contiguous, with NaN only before each user's first day")
+    min_days = 2 * seasonal_periods if seasonal_periods > 1 else 1
+    if (n_obs < max(min_days, 2 if trend else 1)).any():
+        raise ValueError(f"every history needs at least {min_days} days")
+
+    n_grid = alpha_grid.size * (beta_grid.size if trend else 1) * (gamma_grid.size if seasonal_periods > 1 else 1)
+    block = max(1, BLOCK_BYTES // (8 * n_grid * max(seasonal_periods, 1)))
+    phi = phi if trend else 1.0
+    blocks = []
+
+    # Blocks of similar history lengths, each cut to its longest history, so
+    # short histories do not step through the padding of long ones
+    order = np.argsort(-n_obs, kind="stable")
+    for lo in range(0, Y.shape[0], block):
+        users = order[lo:lo + block]
+        first = start[users].min()
+        Y_block, start_block, n_block = Y[users, first:], start[users] - first, n_obs[users]
+        initial = initial_state(Y_block, start_block, n_block, seasonal_periods, trend)
+        params = parameter_grid(len(Y_block), seasonal_periods, trend)
+        step = REFINE_STEP
+
+        for search_round in range(refine_rounds + 1):
+            if search_round > 0:
+                params = refined_grid(best_params, step, seasonal_periods, trend)
+                step /= 2
+            sse, level, slope, season = smooth(Y_block, *params, phi, initial, start_block)
+            best = np.argmin(sse, axis=1)
+            rows = np.arange(len(Y_block))
+            best_params = [param[rows, best] for param in params]
+
+        blocks.append({
+            "alpha": best_params[0], "beta": best_params[1], "gamma": best_params[2],
+            "level": level[rows, best], "trend": slope[rows, best], "season": season[rows, best],
+            "n_obs": n_block, "mse": sse[rows, best] / n_block
+        })
+
+    # Back to the order of the rows of Y
+    inverse = np.argsort(order)
+    fitted = {name: np.concatenate([b[name] for b in blocks])[inverse] for name in blocks[0]}
+    fitted["phi"] = phi
+    return fitted
+
+def fit(y, seasonal_periods=1, trend=False, phi=DAMPING):
+    """
+    Additive (damped) smoothing of one series with the (alpha, beta, gamma)
+    of the parameter grid that has the smallest one-step squared error.
+    Every grid point is run at once.
+    """
+    fitted = fit_batch(y, seasonal_periods=seasonal_periods, trend=trend, phi=phi, refine_rounds=0)
+    return dict({name: value[0] for name, value in fitted.items() if name != "phi"}, phi=fitted["phi"])
+
+def forecast_from_fit(fitted, test_size):
+    """test_size forecasts from a fit; one row per user for fit_batch results."""
+    horizon = np.arange(1, test_size + 1)
+    # Damped trend: step h adds phi + phi^2 + ... + phi^h times the slope
+    trend = np.cumsum(fitted["phi"] ** horizon) * np.asarray(fitted["trend"])[..., None]
+    season = np.asarray(fitted["season"])
+    index = (np.asarray(fitted["n_obs"])[..., None] + horizon - 1) % season.shape[-1]
+    return np.asarray(fitted["level"])[..., None] + trend + np.take_along_axis(season, index, axis=-1)
+
+def forecast(engine, values, test_size):
+    """test_size daily forecasts of one of the NumPy engines."""
+    if engine == "holt_winters_weekly":
+        fitted = fit(values, seasonal_periods=WEEKLY_PERIODS, trend=True)
+    elif engine == "holt":
+        fitted = fit(values, trend=True)
+    elif engine == "ses":
+        fitted = fit(values)
+    else:
+        raise ValueError(f"unknown engine {engine!r}")
+    return forecast_from_fit(fitted, test_size)
@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+class CompiledForest:
+    """
+    Random forest regressor flattened into packed NumPy node arrays.
+
+    Every tree of every target is stored back to back in shared node arrays
+    (feature, threshold, children, leaf value), with tree_offsets marking
+    where each target's trees start. children[node] holds the (right, left)
+    node ids, -1 for leaves, so a split outcome indexes the next node
+    directly. predict walks all trees for a block of rows together, one
+    array step per tree level, and averages the leaves in the same order as
+    sklearn so the results match RandomForestRegressor. From sklearn_rows rows
+    on, the leaves come from sklearn's compiled per-tree traversal instead,
+    which overtakes the array steps once there are enough rows per tree.
+    """
+
+    array_names = ["feature", "threshold", "children", "value", "missing_left", "roots", "tree_offsets"]
+
+    # Rows traversed together; keeps the per-level working set cache sized
+    block_size = 64
+    # Batch size from which sklearn's per-tree apply is faster than the array steps
+    sklearn_rows = 32
+
+    def __init__(self, feature, threshold, children, value, missing_left, roots, tree_offsets,
+                 n_features, feature_names=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.missing_left = missing_left
+        self.roots = roots
+        self.tree_offsets = tree_offsets
+        self.n_features = n_features
+        self.feature_names = feature_names
+        self._sklearn_trees = None
+
+    @property
+    def n_targets(self):
+        return len(self.tree_offsets) - 1
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_estimator(cls, model):
+        """Pack a fitted MultiOutputRegressor of random forests (or a single forest)."""
+        forests = [model] if hasattr(model, "n_outputs_") else model.estimators_
+
+        features, thresholds, children, values, missing = [], [], [], [], []
+        roots, tree_offsets = [], [0]
+        node_offset = 0
+
+        for forest in forests:
+            for estimator in forest.estimators_:
+                tree = estimator.tree_
+                is_leaf = tree.children_left == -1
+
+                features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+                thresholds.append(tree.threshold.astype(np.float64))
+                # Leaves keep -1 so traversal can tell when a path is finished
+                children.append(np.column_stack([
+                    np.where(is_leaf, -1, tree.children_right + node_offset),
+                    np.where(is_leaf, -1, tree.children_left + node_offset)
+                ]).astype(np.int64))
+                values.append(tree.value[:, 0, 0].astype(np.float64))
+                missing.append(np.asarray(getattr(tree, "missing_go_to_left", np.zeros(tree.node_count)), dtype=bool))
+
+                roots.append(node_offset)
+                node_offset += tree.node_count
+            tree_offsets.append(len(roots))
+
+        feature_names = getattr(forests[0], "feature_names_in_", None)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.concatenate(children),
+            value=np.concatenate(values),
+            missing_left=np.concatenate(missing),
+            roots=np.asarray(roots, dtype=np.int64),
+            tree_offsets=np.asarray(tree_offsets, dtype=np.int64),
+            n_features=forests[0].n_features_in_,
+            feature_names=None if feature_names is None else [str(name) for name in feature_names]
+        )
+
+    def leaf_values(self, X):
+        """Leaf value reached by every (row, tree) pair, shape (n_rows, n_trees)."""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        if X.shape[0] >= self.sklearn_rows:
+            return self.value[self._apply_sklearn(X)]
+
+        leaves = np.empty((X.shape[0], self.n_trees), dtype=np.float64)
+        for start in range(0, X.shape[0], self.block_size):
+            block = X[start:start + self.block_size]
+            leaves[start:start + len(block)] = self.value[self._apply(block)].reshape(len(block), self.n_trees)
+
+        return leaves
+
+    def _apply(self, X):
+        children = self.children.ravel()
+        nodes = np.tile(self.roots, X.shape[0])
+        row_offsets = np.repeat(np.arange(X.shape[0], dtype=np.int64) * self.n_features, self.n_trees)
+        flat_X = X.ravel()
+        check_missing = bool(np.isnan(flat_X).any())
+
+        # Only paths that have not reached a leaf are advanced on each step
+        active = np.flatnonzero(children[2 * nodes] != -1)
+        while active.size:
+            current = nodes[active]
+            x = flat_X[row_offsets[active] + self.feature[current]]
+            go_left = x <= self.threshold[current]
+            if check_missing:
+                go_left |= np.isnan(x) & self.missing_left[current]
+
+            current = children[2 * current + go_left]
+            nodes[active] = current
+            active = active[children[2 * current] != -1]
+
+        return nodes
+
+    def _apply_sklearn(self, X):
+        """Node ids of the leaves, shape (n_rows, n_trees), from sklearn's tree traversal."""
+        if self._sklearn_trees is None:
+            self._sklearn_trees = self.sklearn_trees()
+        # Filled a tree at a time, so each tree's leaves are written contiguously
+        nodes = np.empty((self.n_trees, X.shape[0]), dtype=np.int64)
+        for i, tree in enumerate(self._sklearn_trees):
+            nodes[i] = tree.apply(X)
+        return (nodes + self.roots[:, None]).T
+
+    def sklearn_trees(self):
+        """
+        The trees as sklearn Tree objects, built from the node arrays the way
+        sklearn unpickles them. Only apply() is used, so the node statistics
+        and leaf values are left empty; leaf values stay in self.value.
+        """
+        from sklearn.tree._tree import NODE_DTYPE, Tree
+
+        children = np.asarray(self.children)
+        bounds = np.append(self.roots, self.n_nodes)
+        trees = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            tree_children = children[start:end]
+            is_leaf = tree_children[:, 0] == -1
+            nodes = np.zeros(end - start, dtype=NODE_DTYPE)
+            nodes["left_child"] = np.where(is_leaf, -1, tree_children[:, 1] - start)
+            nodes["right_child"] = np.where(is_leaf, -1, tree_children[:, 0] - start)
+            nodes["feature"] = np.where(is_leaf, -2, self.feature[start:end])
+            nodes["threshold"] = self.threshold[start:end]
+            if "missing_go_to_left" in NODE_DTYPE.names:
+                nodes["missing_go_to_left"] = self.missing_left[start:end]
+
+            tree = Tree(self.n_features, np.ones(1, dtype=np.intp), 1)
+            tree.__setstate__({"max_depth": 0, "node_count": end - start, "nodes": nodes,
+                               "values": np.zeros((end - start, 1, 1))})
+            trees.append(tree)
+        return trees
+
+    def predict(self, X):
+        leaves = self.leaf_values(X)
+        preds = np.empty((leaves.shape[0], self.n_targets), dtype=np.float64)
+
+        for target in range(self.n_targets):
+            start, end = self.tree_offsets[target], self.tree_offsets[target + 1]
+            # cumsum adds strictly left to right, like sklearn's running total
+            preds[:, target] = np.cumsum(leaves[:, start:end], axis=1)[:, -1] / (end - start)
+
+        return preds
+
+    def compact(self, trees_per_target, max_depth=None):
+        """
+        A smaller forest keeping the first trees_per_target[t] trees of each
+        target, with every tree cut at max_depth. A node at the cut becomes a
+        leaf predicting its own value (the mean of its training samples), as
+        if the tree had been grown with that max_depth.
+        """
+        roots = np.concatenate([
+            self.roots[self.tree_offsets[target]:self.tree_offsets[target] + count]
+            for target, count in enumerate(trees_per_target)
+        ])
+        children = np.asarray(self.children)
+
+        # Walk the kept trees level by level, collecting the reachable nodes
+        kept, truncated = [], []
+        frontier, depth = roots, 0
+        while frontier.size:
+            kept.append(frontier)
+            internal = frontier[children[frontier, 0] != -1]
+            if max_depth is not None and depth == max_depth:
+                truncated.append(internal)
+                break
+            frontier = children[internal].ravel()
+            depth += 1
+
+        # Keep the original node order, so each tree stays contiguous
+        kept = np.sort(np.concatenate(kept))
+        new_id = np.full(self.n_nodes, -1, dtype=np.int64)
+        new_id[kept] = np.arange(len(kept))
+
+        new_children = np.where(children[kept] == -1, -1, new_id[children[kept]])
+        feature = np.asarray(self.feature)[kept].copy()
+        if truncated:
+            cut = new_id[np.concatenate(truncated)]
+            new_children[cut] = -1
+            feature[cut] = 0
+
+        return CompiledForest(
+            feature=feature,
+            threshold=np.asarray(self.threshold)[kept],
+            children=new_children,
+            value=np.asarray(self.value)[kept],
+            missing_left=np.asarray(self.missing_left)[kept],
+            roots=new_id[roots],
+            tree_offsets=np.concatenate([[0], np.cumsum(trees_per_target)]).astype(np.int64),
+            n_features=self.n_features,
+            feature_names=self.feature_names
+        )
+
+    def fingerprint(self):
+        """Hash of the node arrays; changes whenever the served model does."""
+        digest = hashlib.sha256(str(self.n_features).encode())
+        for name in self.array_names:
+            array = np.ascontiguousarray(getattr(self, name))
+            digest.update(f"|{name}|{array.dtype}|{array.shape}|".encode())
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+
+    @property
+    def nbytes(self):
+        return sum(np.asarray(getattr(self, name)).nbytes for name in self.array_names)
+
+    def warm_up(self):
+        """Fault every node array into memory and run one traversal."""
+        for name in self.array_names:
+            np.asarray(getattr(self, name)).sum()
+        self.predict(np.zeros((1, self.n_features)))
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in self.array_names:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+
+        with open(os.path.join(path, "forest.json"), "w") as f:
+            json.dump({"n_features": int(self.n_features), "feature_names": self.feature_names}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        with open(os.path.join(path, "forest.json")) as f:
+            meta = json.load(f)
+
+        # np.asarray drops the np.memmap subclass (and its per-operation
+        # overhead) while still viewing the mapped pages
+        arrays = {
+            name: np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode))
+            for name in cls.array_names
+        }
+        return cls(**arrays, **meta)
@@ -1,141 +1,247 @@
+import argparse
+import os
+import time
+import numpy as np
 import pandas as pd
-import random
-from faker import Faker
-from datetime import datetime, timedelta
-
-fake = Faker()
-
-# Parameters
-start_date = datetime(2025, 1, 1)
-end_date = datetime(2025, 3, 30)
-monthly_allowance = 10000
-daily_food_range = (100, 200)
-rent_amount = 2500
-wifi_amount = 350
-electricity_range = (250, 400)
-water_range = (100, 200)
-academic_items = ["Notebook", "Ballpen", "Photocopy", "Lab Manual", "Book"]
-leisure_items = ["Netflix", "Movie Ticket", "Mobile Game", "Snack Out", "Spotify"]
-transport_items = ["Jeep Fare", "Bus Fare", "Tricycle Fare", "Ride Share"]
-
-transactions = []
-current_date = start_date
-
-# Counters for monthly events
-academic_days = set()
-leisure_days = set()
-
-# Generate random days per month for academic and leisure expenses
-for month in [1, 2, 3]:
-    academic_days.update(random.sample(range(1, 28), 3))  # 3 academic expenses
-    leisure_days.update(random.sample(range(1, 28), 6))   # 6 leisure events
-
-while current_date <= end_date:
-    day = current_date.day
-    month = current_date.month
-    year = current_date.year
-    weekday = current_date.weekday()
-
-    date_str = current_date.strftime("%Y-%m-%d")
+
+# Run from the repository root, e.g.
+#   python -m app.generateDummyData --users 20000 --start 2024-01-01 --end 2025-12-31 \
+#       --output dataset/synthetic_transactions.parquet
+#
+# Users are generated chunk by chunk and each chunk is appended to the output,
+# so memory stays bounded by --chunk-users. A matching UserInput profile per
+# user is written next to the transactions (<output>_profiles.csv/.parquet).
+# The same --seed and --chunk-users always produce the same data.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+survey_path = os.path.join(BASE_DIR, "dataset", "Student-Spending-Habits.csv")
+
+expense_cols = ["Living_Expenses", "Food_and_Dining_Expenses",
+                "Transportation_Expenses", "Leisure_and_Entertainment_Expenses", "Academic_Expenses"]
+
+# Parameters per spending profile; "default" is the student this script used to generate.
+# Every user's amounts are further scaled by a per-user factor in scale_range.
+spending_profiles = {
+    "default": {
+        "monthly_allowance": 10000,
+        "daily_food_range": (100, 200),
+        "transport_range": (10, 30),
+        "rent_amount": 2500,
+        "wifi_amount": 350,
+        "electricity_range": (250, 400),
+        "water_range": (100, 200),
+        "leisure_range": (50, 300),
+        "academic_range": (30, 500),
+        "leisure_days": 6,
+        "academic_days": 3
+    },
+    "frugal": {
+        "monthly_allowance": 6000,
+        "daily_food_range": (70, 130),
+        "transport_range": (10, 20),
+        "rent_amount": 1500,
+        "wifi_amount": 0,
+        "electricity_range": (150, 250),
+        "water_range": (80, 150),
+        "leisure_range": (30, 150),
+        "academic_range": (20, 300),
+        "leisure_days": 3,
+        "academic_days": 3
+    },
+    "comfortable": {
+        "monthly_allowance": 18000,
+        "daily_food_range": (180, 350),
+        "transport_range": (20, 120),
+        "rent_amount": 4500,
+        "wifi_amount": 1000,
+        "electricity_range": (400, 800),
+        "water_range": (150, 300),
+        "leisure_range": (100, 600),
+        "academic_range": (50, 800),
+        "leisure_days": 10,
+        "academic_days": 4
+    }
+}
+scale_range = (0.8, 1.25)
+
+academic_items = np.array(["Notebook", "Ballpen", "Photocopy", "Lab Manual", "Book"])
+leisure_items = np.array(["Netflix", "Movie Ticket", "Mobile Game", "Snack Out", "Spotify"])
+transport_items = np.array(["Jeep Fare", "Bus Fare", "Tricycle Fare", "Ride Share"])
+
+columns = ["userId", "name", "description", "totalAmount", "category", "type", "date"]
+
+def user_parameters(profile_names, profile_index, scale):
+    """Per-user arrays of every spending parameter, scaled by each user's factor."""
+    params = {}
+    for key in spending_profiles["default"]:
+        values = np.array([spending_profiles[name][key] for name in profile_names], dtype=np.float64)
+        per_user = values[profile_index]
+        if key.endswith("_days"):
+            params[key] = per_user.astype(np.int64)
+        elif per_user.ndim == 2:
+            params[key] = per_user * scale[:, None]
+        else:
+            params[key] = per_user * scale
+    params["monthly_allowance"] = np.round(params["monthly_allowance"], -1)
+    return params
+
+def monthly_event_days(rng, per_month, n_users, month_index, day):
+    """(users, days) mask of the days, per user and month, on which an occasional expense may fall."""
+    # Rank a random key per day of month 1-27; the lowest per_month ranks are that month's days
+    keys = rng.random((n_users, month_index.max() + 1, 27))
+    ranks = keys.argsort(axis=2).argsort(axis=2)
+    chosen = ranks < per_month[:, None, None]
+    return chosen[:, month_index, np.minimum(day, 27) - 1] & (day <= 27)
+
+def generate_chunk(rng, user_ids, params, dates):
+    n_users, n_days = len(user_ids), len(dates)
+    shape = (n_users, n_days)
+    day = dates.day.to_numpy()
+    month_index = (dates.year * 12 + dates.month).to_numpy()
+    month_index = month_index - month_index[0]
+
+    def uniform(value_range):
+        low, high = value_range[:, 0:1], value_range[:, 1:2]
+        return np.round(low + (high - low) * rng.random(shape), 2)
+
+    def per_user(values):
+        return np.broadcast_to(np.round(values, 2)[:, None], shape)
+
+    events = []
+
+    def add(order, mask, name, description, amount, category, type="Expense"):
+        users, days = np.nonzero(mask)
+        events.append(pd.DataFrame({
+            "user": users,
+            "day": days,
+            "order": order,
+            "name": name[users, days] if isinstance(name, np.ndarray) else name,
+            "description": description,
+            "totalAmount": amount[users, days],
+            "category": category,
+            "type": type
+        }))
 
     # Daily food expense (except Sunday)
-    if weekday < 6:
-        transactions.append({
-            "name": "Daily Food",
-            "description": "Meal and drink",
-            "totalAmount": round(random.uniform(*daily_food_range), 2),
-            "category": "Food and Dining",
-            "type": "Expense",
-            "date": date_str
-        })
-
-    # Transportation: 0 to 2 rides a day, or skip every few days
-    if random.random() > 0.2:  # 80% chance of transport today
-        for _ in range(random.choice([1, 2])):  # 1 or 2 trips
-            transactions.append({
-                "name": random.choice(transport_items),
-                "description": "Daily commute",
-                "totalAmount": round(random.uniform(10, 30), 2),
-                "category": "Transportation",
-                "type": "Expense",
-                "date": date_str
-            })
-
-    # Leisure: occasionally
-    if day in leisure_days and random.random() < 0.5:
-        transactions.append({
-            "name": random.choice(leisure_items),
-            "description": "Leisure or entertainment",
-            "totalAmount": round(random.uniform(50, 300), 2),
-            "category": "Leisure and Entertainment",
-            "type": "Expense",
-            "date": date_str
-        })
-
-    # Academic: randomly on selected days
-    if day in academic_days and random.random() < 0.5:
-        transactions.append({
-            "name": random.choice(academic_items),
-            "description": "Academic supplies or materials",
-            "totalAmount": round(random.uniform(30, 500), 2),
-            "category": "Academic",
-            "type": "Expense",
-            "date": date_str
-        })
-
-    # Monthly allowance and bills at end of month
-    if day >= 28:
-        if day == 28:
-            # Allowance
-            transactions.append({
-                "name": "Monthly Allowance",
-                "description": "Allowance from parents",
-                "totalAmount": monthly_allowance,
-                "category": "Leisure and Entertainment",
-                "type": "Income",
-                "date": date_str
-            })
-            # Rent
-            transactions.append({
-                "name": "Monthly Rent",
-                "description": "Boarding house rent",
-                "totalAmount": rent_amount,
-                "category": "Living",
-                "type": "Expense",
-                "date": date_str
-            })
-
-        if day == 29:
-            transactions.append({
-                "name": "Electricity Bill",
-                "description": "Monthly electric bill",
-                "totalAmount": round(random.uniform(*electricity_range), 2),
-                "category": "Living",
-                "type": "Expense",
-                "date": date_str
-            })
-        elif day == 30:
-            transactions.append({
-                "name": "WiFi Bill",
-                "description": "Internet service fee",
-                "totalAmount": wifi_amount,
-                "category": "Living",
-                "type": "Expense",
-                "date": date_str
-            })
-        elif day == 31 and month in [1, 3]:
-            transactions.append({
-                "name": "Water Bill",
-                "description": "Water utility payment",
-                "totalAmount": round(random.uniform(*water_range), 2),
-                "category": "Living",
-                "type": "Expense",
-                "date": date_str
-            })
-
-    current_date += timedelta(days=1)
-
-# Save to CSV
-df = pd.DataFrame(transactions)
-df.to_csv("../dataset/realistic_student_transactions_april_2025.csv", index=False)
-print("CSV file created")
+    add(0, np.broadcast_to(dates.weekday.to_numpy() < 6, shape),
+        "Daily Food", "Meal and drink", uniform(params["daily_food_range"]), "Food and Dining")
+
+    # Transportation: one or two trips on 80% of days
+    travels = rng.random(shape) > 0.2
+    second_trip = travels & (rng.random(shape) < 0.5)
+    for order, mask in [(1, travels), (2, second_trip)]:
+        add(order, mask, transport_items[rng.integers(len(transport_items), size=shape)],
+            "Daily commute", uniform(params["transport_range"]), "Transportation")
+
+    # Leisure and academic: on a few days each month, half of the time
+    leisure = monthly_event_days(rng, params["leisure_days"], n_users, month_index, day) & (rng.random(shape) < 0.5)
+    add(3, leisure, leisure_items[rng.integers(len(leisure_items), size=shape)],
+        "Leisure or entertainment", uniform(params["leisure_range"]), "Leisure and Entertainment")
+    academic = monthly_event_days(rng, params["academic_days"], n_users, month_index, day) & (rng.random(shape) < 0.5)
+    add(4, academic, academic_items[rng.integers(len(academic_items), size=shape)],
+        "Academic supplies or materials", uniform(params["academic_range"]), "Academic")
+
+    # Monthly allowance and bills at the end of the month
+    on_day = lambda d: np.broadcast_to(day == d, shape)
+    add(5, on_day(28), "Monthly Allowance", "Allowance from parents",
+        per_user(params["monthly_allowance"]), "Leisure and Entertainment", type="Income")
+    add(6, on_day(28), "Monthly Rent", "Boarding house rent", per_user(params["rent_amount"]), "Living")
+    add(7, on_day(29), "Electricity Bill", "Monthly electric bill", uniform(params["electricity_range"]), "Living")
+    add(8, on_day(30) & (per_user(params["wifi_amount"]) > 0), "WiFi Bill", "Internet service fee",
+        per_user(params["wifi_amount"]), "Living")
+    add(9, on_day(31), "Water Bill", "Water utility payment", uniform(params["water_range"]), "Living")
+
+    chunk = pd.concat(events, ignore_index=True)
+    chunk = chunk.iloc[np.lexsort((chunk["order"], chunk["day"], chunk["user"]))]
+    chunk["userId"] = user_ids[chunk["user"].to_numpy()]
+    chunk["date"] = dates.strftime("%Y-%m-%d").to_numpy()[chunk["day"].to_numpy()]
+    return chunk[columns].reset_index(drop=True)
+
+def sample_user_profiles(rng, user_ids, allowances):
+    """UserInput profiles drawn from the survey responses, with each user's generated allowance."""
+    survey = pd.read_csv(survey_path, dtype=str).dropna().drop(columns=expense_cols)
+    profiles = survey.iloc[rng.integers(len(survey), size=len(user_ids))].reset_index(drop=True)
+    profiles["Monthly_Allowance"] = allowances.astype(np.int64).astype(str)
+    profiles.insert(0, "userId", user_ids)
+    return profiles
+
+class ChunkWriter:
+    """Appends DataFrames to a CSV or Parquet file; Parquet needs pyarrow."""
+
+    def __init__(self, path, file_format):
+        self.path = path
+        self.file_format = file_format
+        self.writer = None
+        self.rows = 0
+
+    def write(self, df):
+        if self.file_format == "parquet":
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise SystemExit("Parquet output requires pyarrow (pip install pyarrow)")
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self.rows == 0 else "a", header=self.rows == 0, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def generate(n_users, start_date, end_date, profile_names, output_path, profiles_path,
+             file_format="csv", chunk_users=1000, seed=0):
+    dates = pd.date_range(start_date, end_date, freq="D")
+    rng = np.random.default_rng(seed)
+    user_ids = np.array([f"user-{i:07d}" for i in range(n_users)])
+    profile_index = rng.integers(len(profile_names), size=n_users)
+    scale = rng.uniform(*scale_range, size=n_users)
+    params = user_parameters(profile_names, profile_index, scale)
+
+    writer = ChunkWriter(output_path, file_format)
+    try:
+        for chunk_index, first in enumerate(range(0, n_users, chunk_users)):
+            users = slice(first, first + chunk_users)
+            chunk_rng = np.random.default_rng([seed, chunk_index])
+            chunk_params = {key: values[users] for key, values in params.items()}
+            writer.write(generate_chunk(chunk_rng, user_ids[users], chunk_params, dates))
+    finally:
+        writer.close()
+
+    profiles = sample_user_profiles(rng, user_ids, params["monthly_allowance"])
+    profiles_writer = ChunkWriter(profiles_path, file_format)
+    profiles_writer.write(profiles)
+    profiles_writer.close()
+    return writer.rows
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic student transactions and matching profiles.")
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--start", default="2025-01-01", help="first date (YYYY-MM-DD)")
+    parser.add_argument("--end", default="2025-03-30", help="last date (YYYY-MM-DD)")
+    parser.add_argument("--spending-profiles", nargs="+", default=["default"], choices=sorted(spending_profiles),
+                        help="profiles assigned to users at random")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-users", type=int, default=1000, help="users generated and written at a time")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="defaults to the output file extension")
+    parser.add_argument("--output", default=os.path.join(BASE_DIR, "dataset", "synthetic_transactions.csv"))
+    parser.add_argument("--profiles-output", help="defaults to <output>_profiles with the same extension")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    stem, extension = os.path.splitext(args.output)
+    file_format = args.format or ("parquet" if extension == ".parquet" else "csv")
+    profiles_path = args.profiles_output or f"{stem}_profiles{extension or '.' + file_format}"
+
+    start = time.perf_counter()
+    rows = generate(args.users, args.start, args.end, args.spending_profiles, args.output, profiles_path,
+                    file_format=file_format, chunk_users=args.chunk_users, seed=args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"{rows} transactions for {args.users} users in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+    print(f"Transactions: {args.output}")
+    print(f"Profiles:     {profiles_path}")
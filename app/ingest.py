@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+class Transactions:
+    """
+    A user's transaction list parsed once per request into the two views the
+    pipeline reads: daily expense totals for Exponential Smoothing and
+    month x category expense totals for the budget adjustment.
+
+    Months are keyed as YYYYMM integers. Both aggregates come from the same
+    pandas groupby sums the stages used to compute separately, so the
+    results are unchanged.
+    """
+
+    def __init__(self, user_id, daily_dates, daily_amounts, months, categories, category_totals):
+        self.user_id = user_id
+        self.daily_dates = daily_dates
+        self.daily_amounts = daily_amounts
+        self.months = months
+        self.categories = categories
+        self.category_totals = category_totals
+
+    @classmethod
+    def from_records(cls, data_json):
+        return cls.from_frame(pd.DataFrame(data_json))
+
+    @classmethod
+    def from_columns(cls, user_id, dates, amounts, types, categories):
+        """Transactions from parallel arrays, as sent in the columnar wire format."""
+        return cls.from_frame(pd.DataFrame({
+            'userId': user_id,
+            'totalAmount': np.asarray(amounts, dtype=np.float64),
+            'category': categories,
+            'type': types,
+            'date': dates
+        }))
+
+    @classmethod
+    def from_frame(cls, df):
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.sort_values(by='date').reset_index(drop=True)
+
+        # Transactions of a single user can reuse that user's smoothing state
+        user_id = str(df['userId'].iloc[0]) if 'userId' in df.columns and df['userId'].nunique() == 1 else None
+
+        df = df[df['type'] == 'Expense']
+
+        daily = df.groupby('date')['totalAmount'].sum()
+
+        if 'category' in df.columns:
+            month_key = (df['date'].dt.year * 100 + df['date'].dt.month).rename('month')
+            by_month = df.groupby([month_key, 'category'])['totalAmount'].sum().unstack(fill_value=0.0)
+            months = by_month.index.to_numpy(dtype=np.int64)
+            categories = by_month.columns.to_numpy()
+            category_totals = by_month.to_numpy(dtype=np.float64)
+        else:
+            months = np.empty(0, dtype=np.int64)
+            categories = np.empty(0, dtype=object)
+            category_totals = np.empty((0, 0), dtype=np.float64)
+
+        return cls(
+            user_id=user_id,
+            daily_dates=daily.index.rename('date'),
+            daily_amounts=daily.to_numpy(dtype=np.float64),
+            months=months,
+            categories=categories,
+            category_totals=category_totals
+        )
+
+    @property
+    def latest_date(self):
+        return self.daily_dates.max()
+
+    def daily_series(self):
+        return pd.Series(self.daily_amounts, index=self.daily_dates, name='amount')
+
+    def month_totals(self, year, month):
+        """Expense totals by category for one month; empty if it has no expenses."""
+        rows = np.flatnonzero(self.months == year * 100 + month) if 1 <= month <= 12 else []
+        if len(rows) == 0:
+            return {}
+        return dict(zip(self.categories, self.category_totals[rows[0]]))
+
+def ingest(data_json):
+    """Transactions for a list of transaction dicts, or None when the list is empty."""
+    if isinstance(data_json, Transactions):
+        return data_json
+    if not data_json:
+        return None
+    return Transactions.from_records(data_json)
@@ -1,23 +1,69 @@
-import pickle
-from fastapi import FastAPI
+import hashlib
+import hmac
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
 import pandas as pd
 import numpy as np
 import os
 from app import Exponential
-from app import adjustment
-from typing import List, Optional
-from sklearn.metrics import r2_score
-
-current_dir = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(current_dir, "SocioDemoRFModel.pkl")
-rf_model_r2 = 0.85
-
-with open(model_path, 'rb') as f:
-    model = pickle.load(f)
-
-app = FastAPI()
+from app import metrics
+from app import smoothing
+from app.cache import SingleFlight, cache_from_env
+from app.artifacts import manager_from_env, set_current, training_csv_columns, version_paths
+from app.ingest import Transactions, ingest
+from app.prediction import ColumnarTransactions, CombinedInput, ExpenseItem, UserInput, build_prediction
+from app.store import store_from_env
+from app.utils import convert_to_numeric, ordinal_mappings
+from app.wire import WireRoute, json_response
+from app.workers import admission_from_env, pool_from_env
+from typing import List, Optional, Union
+
+# key=value lines; DEBUG also logs the intermediate frames of every request
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "WARNING").upper(),
+    format="ts=%(asctime)s level=%(levelname)s logger=%(name)s %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# ES fits run here; FORECAST_POOL_SIZE=0 runs them on threads of this process
+forecast_pool = pool_from_env()
+
+metrics.registry.register(metrics.CallbackMetric(
+    "foresight_forecast_deadline_exceeded_total", "ES forecasts abandoned at the deadline.",
+    lambda: forecast_pool.timeouts, kind="counter"))
+
+# Bounds the /predict requests forecasting at once (ES_MAX_CONCURRENT) and
+# waiting for a slot (ES_MAX_QUEUE); the rest are shed per ES_OVERFLOW
+admission = admission_from_env()
+
+metrics.registry.register(metrics.CallbackMetric(
+    "foresight_es_in_flight", "/predict requests in the ES stage.", lambda: admission.active))
+metrics.registry.register(metrics.CallbackMetric(
+    "foresight_es_queue_depth", "/predict requests waiting for an ES slot.", lambda: admission.queued))
+metrics.registry.register(metrics.CallbackMetric(
+    "foresight_es_saturated", "1 while every ES slot and queue place is taken, so new requests are shed.",
+    lambda: int(admission.saturated)))
+metrics.registry.register(metrics.CallbackMetric(
+    "foresight_es_shed_total", "/predict requests shed by admission control.",
+    lambda: admission.shed, kind="counter"))
+
+readiness = {"ready": False, "warm_up_seconds": None}
+
+@asynccontextmanager
+async def lifespan(app):
+    warm_up()
+    yield
+    models.stop()
+    forecast_pool.shutdown()
+
+# Request bodies may be JSON or MessagePack, chosen by Content-Type
+app = FastAPI(lifespan=lifespan)
+app.router.route_class = WireRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,47 +79,26 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
-def convert_to_numeric(value):
-    if isinstance(value, str):
-        value = value.lower().replace(',', '').strip()
-        if 'k' in value:
-            return float(value.replace('k', '')) * 1000
-        try:
-            return float(value)
-        except ValueError:
-            return np.nan
-    return value
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    start = time.perf_counter()
+    metrics.request_started.set(start)
+    response = await call_next(request)
+
+    # Label by route template so path parameters do not explode the series
+    route = request.scope.get("route")
+    endpoint = route.path if route is not None else "unmatched"
+    metrics.request_seconds.observe(time.perf_counter() - start, endpoint=endpoint)
+    metrics.requests_total.inc(endpoint=endpoint, status=response.status_code)
+    return response
 
 def preprocess_input(raw_input: dict, reference_columns: list) -> pd.DataFrame:
     df_input = pd.DataFrame([raw_input])
 
     df_input["Monthly_Allowance"] = df_input["Monthly_Allowance"].apply(convert_to_numeric)
 
-    age_mapping = {"Under 18": 1, "18-20": 2, "21-23": 3, "24-26": 4, "27 and above": 5}
-    year_level_mapping = {"Freshman": 1, "Sophomore": 2, "Junior": 3, "Senior": 4}
-    roommates_mapping = {
-        "With family": 0, "I live alone": 1, "I live with 1 roommate": 2,
-        "I live with 2-3 roommates": 3, "I live with more than 3 roommates": 4
-    }
-    study_hours_mapping = {
-        "Less then 10 hours": 1, "10-20 hours": 2, "21-30 hours": 3,
-        "31-40 hours": 4, "More then 40 hours": 5
-    }
-    income_mapping = {
-        "Less than P12,030": 1, "P12,031 - P24,060": 2, "P24,061 - P48,120": 3,
-        "P48,121 - P84,210": 4, "P84,211 - P144,360": 5, "P144,361 - P240,600": 6,
-        "More than P240,601": 7
-    }
-    going_home_mapping = {
-        "Not at all": 1, "Rarely": 2, "Sometimes": 3, "Often": 4, "Always": 5
-    }
-
-    df_input["Age_Group"] = df_input["Age_Group"].map(age_mapping)
-    df_input["Year_Level"] = df_input["Year_Level"].map(year_level_mapping)
-    df_input["Roommates"] = df_input["Roommates"].map(roommates_mapping)
-    df_input["Hours_of_Study_per_Week"] = df_input["Hours_of_Study_per_Week"].map(study_hours_mapping)
-    df_input["Family_Monthly_Income"] = df_input["Family_Monthly_Income"].map(income_mapping)
-    df_input["Frequency_of_Going_Home"] = df_input["Frequency_of_Going_Home"].map(going_home_mapping)
+    for col, mapping in ordinal_mappings.items():
+        df_input[col] = df_input[col].map(mapping)
 
     yes_no_cols = [col for col in df_input.columns if df_input[col].dropna().isin(["Yes", "No"]).all()]
     df_input[yes_no_cols] = df_input[yes_no_cols].apply(lambda x: x.map({"Yes": 1, "No": 0}))
@@ -92,194 +117,257 @@ def preprocess_input(raw_input: dict, reference_columns: list) -> pd.DataFrame:
 
     return df_input
 
-def rescale_predictions(categories, total):
-
-    print("Adjusting categories to:", total)
-    categories_total = sum(categories.values())
-    scaling_factor = total / categories_total if categories_total != 0 else 0
-    scaled = {k: v * scaling_factor for k, v in categories.items()}
-    return scaled
-
-def append_scaling_message(messages: dict, scaled_budgets: dict) -> dict:
-    updated_messages = {}
-    for category, message in messages.items():
-        scaled_amount = scaled_budgets.get(category)
-        if scaled_amount is not None:
-            new_message = f"{message} But since the total budget amount exceeded your monthly allowance, it is scaled down to {scaled_amount:.2f}."
-            updated_messages[category] = new_message
+# The served model version, from MODEL_DIR/CURRENT (or the legacy export). With
+# MODEL_LOAD_MODE=mmap (default) the forest's node arrays are memory mapped, so
+# loading is a few file opens and every uvicorn worker shares the same
+# page-cache copy; MODEL_LOAD_MODE=pickle compiles the forest from the sklearn
+# model in each worker's private memory. New versions are picked up every
+# MODEL_RELOAD_INTERVAL seconds without a restart.
+models = manager_from_env(UserInput.model_fields, fallback_columns=training_csv_columns)
+
+metrics.registry.register(metrics.CallbackMetric(
+    "foresight_model_reloads_total", "Model versions swapped in without a restart.",
+    lambda: models.reloads, kind="counter"))
+metrics.registry.register(metrics.CallbackMetric(
+    "foresight_model_reload_failures_total", "Model versions that failed to load.",
+    lambda: models.failures, kind="counter"))
+
+# RF outputs per student profile. Keys include the served forest's fingerprint,
+# so entries of a previous model are never served; RF_CACHE_SIZE=0 disables it
+rf_cache = cache_from_env("RF_CACHE", max_entries=4096, ttl=None)
+metrics.register_cache("rf_cache", "RF prediction cache", rf_cache)
+metrics.register_cache("forecast_cache", "ES forecast cache", Exponential.forecast_cache)
+metrics.register_cache("es_state", "Per-user ES state store", smoothing.state_store)
+
+def profile_key(user_data: UserInput, model):
+    profile = json.dumps(user_data.model_dump(), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{model.fingerprint}|{profile}".encode()).hexdigest()
+
+def predict_categories(endpoint, profiles: List[UserInput]):
+    """RF predictions for each profile, encoding and predicting only the cache misses."""
+    # One model for the whole request, even if a new version is swapped in meanwhile
+    model = models.active
+    keys = [profile_key(profile, model) for profile in profiles]
+    rf_preds = np.empty((len(profiles), model.forest.n_targets))
+    missing = []
+    for i, key in enumerate(keys):
+        cached = rf_cache.get(key)
+        if cached is None:
+            missing.append(i)
         else:
-            # If somehow scaled_budgets missing a category, just keep the original
-            updated_messages[category] = message
-    return updated_messages
-
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-csv_path = os.path.join(BASE_DIR, "dataset", "Student-Spending-Habits_PreProcessed.csv")
-
-reference_df = pd.read_csv(csv_path)
-reference_columns = reference_df.drop(columns=[
-    "Living_Expenses", "Food_and_Dining_Expenses", 
-    "Transportation_Expenses", "Leisure_and_Entertainment_Expenses", 
-    "Academic_Expenses"
-]).columns.tolist()
-
-class UserInput(BaseModel):
-    Age_Group: str
-    Sex: str
-    Year_Level: str
-    In_relationship: str
-    Personality: str
-    Home_Region: str
-    Living_Situation: str
-    Dorm_Area: str
-    Roommates: str
-    Degree_Program: str
-    In_Organization: str
-    Hours_of_Study_per_Week: str
-    Monthly_Allowance: str
-    Family_Monthly_Income: str
-    Have_Scholarship: str
-    Have_Job: str
-    Meal_Preferences: str
-    Frequency_of_Going_Home: str
-    Have_Health_Concern: str
-    Preferred_Payment_Method: str
-
-class ExpenseItem(BaseModel):
-    userId: str
-    name: str
-    totalAmount: float
-    category: str
-    type: str
-    description: str
-    date: str
-
-class PreviousCategoryPrediction(BaseModel):
-    living_expenses: float
-    food_and_dining_expenses: float
-    transportation_expenses: float
-    academic_expenses: float
-    leisure_and_entertainment_expenses: float
-
-class PreviousForecast(BaseModel):
-    userId: str
-    forecasted: List[float]
-    dates: List[str]
-    category: PreviousCategoryPrediction
-
-class CombinedInput(BaseModel):
-    user_data: UserInput
-    transactions: Optional[List[ExpenseItem]] = None
-    previous_forecast: Optional[PreviousForecast] = None
+            rf_preds[i] = cached
+
+    if missing:
+        # The encoder writes each profile as its own row, so the features match
+        # the single-call path exactly
+        with metrics.stage(endpoint, "preprocess"):
+            features = model.encoder.encode_many([profiles[i].model_dump() for i in missing])
+        with metrics.stage(endpoint, "rf_predict"):
+            computed = model.forest.predict(features)
+        for i, preds in zip(missing, computed):
+            rf_preds[i] = preds
+            rf_cache.set(keys[i], preds.tolist())
+
+    return rf_preds
+
+def warm_up():
+    # Touch the model pages and first-call code paths before accepting traffic
+    start = time.perf_counter()
+    models.active.warm_up()
+    Exponential.warm_up()
+    forecast_pool.start()
+    models.start()
+    readiness.update(ready=True, warm_up_seconds=time.perf_counter() - start)
+
+# Server-side transaction history, enabled by TRANSACTION_STORE_PATH
+transaction_store = store_from_env()
 
 @app.get("/")
 def home():
     return {"health_check": "OK"}
 
-
+@app.get("/ready")
+def ready():
+    # Ready while this worker can serve /predict: warmed up, with a warm model
+    # and its forecast pool running. A load burst is not a failure here; the
+    # admission controller sheds it and /metrics reports the saturation
+    model = models.active
+    checks = {
+        "warmed_up": readiness["ready"],
+        "model_loaded": model is not None and model.warm_up_seconds is not None,
+        "forecast_pool": forecast_pool.running
+    }
+    content = dict(readiness, ready=all(checks.values()), checks=checks,
+                   model_version=model.version if model is not None else None)
+    if not content["ready"]:
+        return JSONResponse(status_code=503, content=content)
+    return content
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+def admin_denied(token):
+    # Admin endpoints are disabled unless ADMIN_TOKEN is set, so an unconfigured
+    # deployment cannot have its model switched by anyone who reaches it
+    expected = os.environ.get("ADMIN_TOKEN")
+    if not expected:
+        return JSONResponse(status_code=403, content={"detail": "Admin endpoints are disabled (set ADMIN_TOKEN)"})
+    if token is None or not hmac.compare_digest(token.encode(), expected.encode()):
+        return JSONResponse(status_code=403, content={"detail": "Invalid admin token"})
+    return None
+
+@app.get("/admin/model")
+def model_status(x_admin_token: Optional[str] = Header(None)):
+    return admin_denied(x_admin_token) or models.describe()
+
+@app.post("/admin/model/reload")
+def reload_model(version: Optional[str] = None, x_admin_token: Optional[str] = Header(None)):
+    """Switch to the version CURRENT points at now, or first point CURRENT at version (e.g. to roll back)."""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    if version is not None:
+        try:
+            if not os.path.exists(version_paths(version)["manifest"]):
+                return JSONResponse(status_code=404, content={"detail": f"Unknown model version {version}"})
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"detail": str(e)})
+        # Other workers follow CURRENT on their next poll
+        set_current(version)
+    changed = models.reload(force=True)
+    return dict(models.describe(), changed=changed)
+
+@app.post("/transactions")
+def append_transactions(data: Union[List[ExpenseItem], ColumnarTransactions]):
+    if transaction_store is None:
+        return JSONResponse(status_code=503, content={"detail": "No transaction store configured (set TRANSACTION_STORE_PATH)"})
+    records = data.to_records() if isinstance(data, ColumnarTransactions) else [t.model_dump() for t in data]
+    return {"appended": transaction_store.append(records)}
+
+def serialize(endpoint, content):
+    # Serialize inside the endpoint so the stage can be timed
+    with metrics.stage(endpoint, "serialize"):
+        return json_response(content)
+
+# Identical /predict requests that arrive while one is computing (the
+# frontend repeats them on page load, tab focus and transaction edits) wait
+# for and share its response instead of running the pipeline again
+predict_flights = SingleFlight()
+
+metrics.registry.register(metrics.CallbackMetric(
+    "foresight_predict_coalesced_total", "/predict requests answered with another in-flight request's result.",
+    lambda: predict_flights.shared, kind="counter"))
+
+def request_key(data: CombinedInput):
+    # Field order and float formatting are normalized by the dump
+    request = json.dumps(data.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{models.active.fingerprint}|{request}".encode()).hexdigest()
 
 @app.post("/predict")
 def combined_predict(data: CombinedInput):
-    # Predict from RF
-
-    input_df = preprocess_input(data.user_data.model_dump(), reference_columns)
-    rf_preds = model.predict(input_df)[0]
-    rf_categories = [
-        "Living_Expenses", "Food_and_Dining_Expenses", 
-        "Transportation_Expenses", "Leisure_and_Entertainment_Expenses", 
-        "Academic_Expenses"
+    endpoint = "/predict"
+    metrics.observe_parse(endpoint)
+
+    result = predict_flights.do(request_key(data), lambda: compute_prediction(endpoint, data))
+    if isinstance(result, Response):
+        return result
+    metrics.count_prediction(endpoint, result)
+    return serialize(endpoint, result)
+
+def compute_prediction(endpoint, data: CombinedInput):
+    # Predict from RF, unless this profile was predicted before
+    rf_preds = predict_categories(endpoint, [data.user_data])[0]
+
+    # Forecast from Exponential Smoothing, bounded by the pool deadline, once
+    # admission control gives this request a slot
+    with admission.slot() as admitted:
+        if admitted:
+            with metrics.stage(endpoint, "ingest"):
+                transactions = ingest_transactions(data)
+            with metrics.stage(endpoint, "es_forecast"):
+                es_prediction = forecast_pool.forecast(transactions, data.previous_forecast)
+        elif admission.overflow == "reject":
+            return capacity_response()
+        else:
+            transactions = None
+            es_prediction = skipped_forecast()
+
+    return build_prediction(data, rf_preds, transactions, es_prediction, endpoint)
+
+# Users of a /predict/batch request forecast per admission slot
+batch_chunk_users = int(os.environ.get("ES_BATCH_CHUNK", 8))
+
+def capacity_response():
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is at forecasting capacity, retry later"},
+        headers={"Retry-After": str(admission.retry_after)}
+    )
+
+def skipped_forecast():
+    return {"success": False, "message": "Forecast skipped: server is at forecasting capacity"}
+
+@app.post("/predict/batch")
+def batch_predict(data: List[CombinedInput]):
+    endpoint = "/predict/batch"
+    metrics.observe_parse(endpoint)
+    if not data:
+        return []
+
+    # One forest pass for every uncached student, then the per-user ES and adjustment steps
+    rf_preds = predict_categories(endpoint, [item.user_data for item in data])
+
+    with metrics.stage(endpoint, "ingest"):
+        transactions = [ingest_transactions(item) for item in data]
+
+    # Each chunk of users takes one admission slot, like a /predict request,
+    # and gets FORECAST_TIMEOUT for its forecasts; a shed chunk falls back to
+    # RF-only, or the whole batch is rejected with ES_OVERFLOW=reject
+    es_predictions = []
+    with metrics.stage(endpoint, "es_forecast"):
+        for first in range(0, len(data), batch_chunk_users):
+            chunk = data[first:first + batch_chunk_users]
+            with admission.slot() as admitted:
+                if admitted:
+                    es_predictions += forecast_pool.forecast_many(
+                        transactions[first:first + batch_chunk_users], [item.previous_forecast for item in chunk])
+                elif admission.overflow == "reject":
+                    return capacity_response()
+                else:
+                    es_predictions += [skipped_forecast() for _ in chunk]
+
+    results = [
+        build_prediction(item, preds, txns, es_prediction, endpoint)
+        for item, preds, txns, es_prediction in zip(data, rf_preds, transactions, es_predictions)
     ]
-    rf_pred_dict = dict(zip(rf_categories, rf_preds.tolist()))
-    rf_total = sum(rf_preds)
+    for result in results:
+        metrics.count_prediction(endpoint, result)
+    return serialize(endpoint, results)
 
-    # Prepare transactions for Exponential Smoothing
-    txn_dicts = [t.model_dump() for t in data.transactions] if data.transactions else []
+def ingest_transactions(data: CombinedInput):
+    # Parse the transactions once for both Exponential Smoothing and the budget adjustment
+    if data.transactions is None and data.userId and transaction_store is not None:
+        return transaction_store.transactions(data.userId)
+    if isinstance(data.transactions, ColumnarTransactions):
+        return ingest_columns(data.transactions)
 
-    # Forecast from Exponential Smoothing
-    es_prediction = Exponential.forecast_expenses(txn_dicts, data.previous_forecast)
-
-    if es_prediction["success"]:
-        es_r2 = es_prediction["metrics"].get("r2", 1 - rf_model_r2) #Default is 0.15
-        es_total = es_prediction["metrics"]["total_forecasted"]
-
-        # Clamp r2 to [0, 1]
-        es_r2 = max(es_r2, 0)
-
-        # Confidence-weighted total
-        combined_total = es_r2 * es_total + (1 - es_r2) * rf_total
-
-        # Rescale RF predictions to match combined total
-        scaled_rf = rescale_predictions(rf_pred_dict, combined_total)
-
-        if(data.previous_forecast):
-            adjusted_category = adjustment.budget_adjustment(txn_dicts, data.previous_forecast.category, scaled_rf)
-
-            if (sum(adjusted_category["adjusted_predictions"].values()) > float(data.user_data.Monthly_Allowance)):
-                scaled = rescale_predictions(adjusted_category["adjusted_predictions"], float(data.user_data.Monthly_Allowance))
-                scaled_message  = append_scaling_message(adjusted_category["messages"], scaled)
-
-                return {
-                    "prediction_exceed": True,
-                    "es_success": True,
-                    "combined_total": sum(adjusted_category["adjusted_predictions"].values()),
-                    "categories": scaled,
-                    "adjustment_info": scaled_message,
-                    "rf_total": rf_total,
-                    "es_prediction": es_prediction,
-                    "es_r2_score": es_r2
-                }
-            else: 
-                return {
-                    "prediction_exceed": False,
-                    "es_success": True,
-                    "combined_total": sum(adjusted_category["adjusted_predictions"].values()),
-                    "categories": adjusted_category["adjusted_predictions"],
-                    "adjustment_info": adjusted_category["messages"],
-                    "rf_total": rf_total,
-                    "es_prediction": es_prediction,
-                    "es_r2_score": es_r2
-                }
-        else:
-            if(combined_total > float(data.user_data.Monthly_Allowance)):
-                scaled = rescale_predictions(rf_pred_dict, float(data.user_data.Monthly_Allowance))
-                
-
-                return {
-                    "prediction_exceed": True,
-                    "es_success": True,
-                    "combined_total": combined_total,
-                    "categories": scaled,
-                    "rf_total": rf_total,
-                    "es_prediction": es_prediction,
-                    "es_r2_score": es_r2
-                } 
-            else:
-                return {
-                        "prediction_exceed": False,
-                        "es_success": True,
-                        "combined_total": combined_total,
-                        "categories": scaled_rf,
-                        "rf_total": rf_total,
-                        "es_prediction": es_prediction,
-                        "es_r2_score": es_r2
-                    } 
-    else:
-
-        if(rf_total > float(data.user_data.Monthly_Allowance)):
-            scaled = rescale_predictions(rf_pred_dict, float(data.user_data.Monthly_Allowance))
-
-            return {
-            "prediction_exceed": True,
-            "es_success": False,
-            "es_message": str(es_prediction["message"]),
-            "categories": scaled,
-            "rf_total": rf_total
-        }
-
-        # Fall back to RF-only predictions
-        return {
-            "prediction_exceed": False,
-            "es_success": False,
-            "es_message": str(es_prediction["message"]),
-            "categories": rf_pred_dict,
-            "rf_total": rf_total
-        }
+    txn_dicts = [t.model_dump() for t in data.transactions] if data.transactions else []
+    try:
+        return ingest(txn_dicts)
+    except Exception:
+        # Leave malformed transactions for each stage to report as before
+        return txn_dicts
+
+def ingest_columns(columns: ColumnarTransactions):
+    # The arrays go straight into the frame; no per-transaction objects are built
+    if not columns.date:
+        return None
+    try:
+        return Transactions.from_columns(
+            columns.userId, columns.date, columns.amount,
+            np.asarray(columns.type_names, dtype=object)[columns.type],
+            np.asarray(columns.category_names, dtype=object)[columns.category]
+        )
+    except Exception:
+        return columns.to_records()
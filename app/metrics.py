@@ -0,0 +1,142 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; spans sub-millisecond encoding up to multi-second ES fits
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class CallbackMetric:
+    """Gauge or counter whose value is read from a callback when metrics are scraped."""
+
+    def __init__(self, name, documentation, callback, kind="gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.kind = kind
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            f"{self.name} {self.callback()}"
+        ]
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts, sum, count]
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (bucket_counts, total, count) in sorted(self.series.items()):
+                names = self.labelnames + ("le",)
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    lines.append(f"{self.name}_bucket{format_labels(names, key + (bound,))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{format_labels(names, key + ('+Inf',))} {count}")
+                lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    "foresight_requests_total", "HTTP requests served.", ("endpoint", "status")))
+request_seconds = registry.register(Histogram(
+    "foresight_request_seconds", "End-to-end HTTP request latency.", ("endpoint",)))
+stage_seconds = registry.register(Histogram(
+    "foresight_stage_seconds", "Latency of each /predict pipeline stage.", ("endpoint", "stage")))
+predictions_total = registry.register(Counter(
+    "foresight_predictions_total", "Predictions by ES outcome and allowance scaling path.",
+    ("endpoint", "es", "exceeded")))
+
+# Set by the HTTP middleware so endpoints can time request parsing
+request_started = ContextVar("request_started", default=None)
+
+@contextmanager
+def stage(endpoint, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, endpoint=endpoint, stage=name)
+
+def observe_parse(endpoint):
+    """Time from the request reaching the app until the endpoint body runs."""
+    started = request_started.get()
+    if started is not None:
+        stage_seconds.observe(time.perf_counter() - started, endpoint=endpoint, stage="parse")
+
+def register_cache(name, description, cache):
+    """Export a TTLCache's lookup counters and size."""
+    for counter in ("hits", "misses", "evictions"):
+        registry.register(CallbackMetric(
+            f"foresight_{name}_{counter}_total", f"{description} {counter}.",
+            lambda counter=counter: cache.totals()[counter], kind="counter"))
+    registry.register(CallbackMetric(
+        f"foresight_{name}_entries", f"{description} entries.", lambda: len(cache.backend)))
+
+def count_prediction(endpoint, result):
+    predictions_total.inc(
+        endpoint=endpoint,
+        es="success" if result["es_success"] else "fallback",
+        exceeded="true" if result["prediction_exceed"] else "false"
+    )
@@ -0,0 +1,223 @@
+import logging
+import numpy as np
+from pydantic import BaseModel, model_validator
+from app import adjustment
+from app import metrics
+from app.utils import convert_to_numeric
+from typing import List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# The request models and the RF + ES blend behind /predict. Importing this
+# module loads no model and starts nothing, so the API and app/bulkScore.py's
+# worker processes share it.
+
+rf_model_r2 = 0.85
+
+rf_categories = [
+    "Living_Expenses", "Food_and_Dining_Expenses", 
+    "Transportation_Expenses", "Leisure_and_Entertainment_Expenses", 
+    "Academic_Expenses"
+]
+
+class UserInput(BaseModel):
+    Age_Group: str
+    Sex: str
+    Year_Level: str
+    In_relationship: str
+    Personality: str
+    Home_Region: str
+    Living_Situation: str
+    Dorm_Area: str
+    Roommates: str
+    Degree_Program: str
+    In_Organization: str
+    Hours_of_Study_per_Week: str
+    Monthly_Allowance: str
+    Family_Monthly_Income: str
+    Have_Scholarship: str
+    Have_Job: str
+    Meal_Preferences: str
+    Frequency_of_Going_Home: str
+    Have_Health_Concern: str
+    Preferred_Payment_Method: str
+
+class ExpenseItem(BaseModel):
+    userId: str
+    name: str
+    totalAmount: float
+    category: str
+    type: str
+    description: str
+    date: str
+
+class ColumnarTransactions(BaseModel):
+    """
+    One user's transactions as parallel arrays, a compact alternative to a
+    list of ExpenseItem objects. type and category hold indices into
+    type_names and category_names.
+    """
+    userId: str
+    date: List[str]
+    amount: List[float]
+    type: List[int]
+    category: List[int]
+    type_names: List[str] = ["Expense", "Income"]
+    category_names: List[str]
+
+    @model_validator(mode="after")
+    def check_columns(self):
+        if not len(self.date) == len(self.amount) == len(self.type) == len(self.category):
+            raise ValueError("date, amount, type and category must have the same length")
+        for codes, names in ((self.type, "type_names"), (self.category, "category_names")):
+            if codes and not 0 <= min(codes) <= max(codes) < len(getattr(self, names)):
+                raise ValueError(f"codes must index into {names}")
+        return self
+
+    def to_records(self):
+        return [
+            {"userId": self.userId, "totalAmount": amount, "category": self.category_names[category],
+             "type": self.type_names[type_code], "date": date}
+            for date, amount, type_code, category in zip(self.date, self.amount, self.type, self.category)
+        ]
+
+class PreviousCategoryPrediction(BaseModel):
+    living_expenses: float
+    food_and_dining_expenses: float
+    transportation_expenses: float
+    academic_expenses: float
+    leisure_and_entertainment_expenses: float
+
+class PreviousForecast(BaseModel):
+    userId: str
+    forecasted: List[float]
+    dates: List[str]
+    category: PreviousCategoryPrediction
+
+class CombinedInput(BaseModel):
+    user_data: UserInput
+    transactions: Optional[Union[List[ExpenseItem], ColumnarTransactions]] = None
+    previous_forecast: Optional[PreviousForecast] = None
+    # Without transactions, the history appended to the transaction store for this user is used
+    userId: Optional[str] = None
+
+def rescale_predictions(categories, total):
+
+    logger.debug("event=rescale total=%s", total)
+    categories_total = sum(categories.values())
+    scaling_factor = total / categories_total if categories_total != 0 else 0
+    scaled = {k: v * scaling_factor for k, v in categories.items()}
+    return scaled
+
+def monthly_allowance(user_data) -> float:
+    # Parsed like the model input, so "10,400" and "10k" are accepted too
+    allowance = convert_to_numeric(user_data.Monthly_Allowance)
+    if np.isnan(allowance):
+        raise ValueError(f"Monthly_Allowance {user_data.Monthly_Allowance!r} is not a number")
+    return allowance
+
+def append_scaling_message(messages: dict, scaled_budgets: dict) -> dict:
+    updated_messages = {}
+    for category, message in messages.items():
+        scaled_amount = scaled_budgets.get(category)
+        if scaled_amount is not None:
+            new_message = f"{message} But since the total budget amount exceeded your monthly allowance, it is scaled down to {scaled_amount:.2f}."
+            updated_messages[category] = new_message
+        else:
+            # If somehow scaled_budgets missing a category, just keep the original
+            updated_messages[category] = message
+    return updated_messages
+
+def build_prediction(data: CombinedInput, rf_preds, transactions, es_prediction, endpoint="/predict"):
+    # Blend one user's RF category predictions with their ES forecast
+    rf_pred_dict = dict(zip(rf_categories, rf_preds.tolist()))
+    rf_total = sum(rf_preds)
+    allowance = monthly_allowance(data.user_data)
+
+    if es_prediction["success"]:
+        es_r2 = es_prediction["metrics"].get("r2", 1 - rf_model_r2) #Default is 0.15
+        es_total = es_prediction["metrics"]["total_forecasted"]
+
+        # Clamp r2 to [0, 1]
+        es_r2 = max(es_r2, 0)
+
+        # Confidence-weighted total
+        combined_total = es_r2 * es_total + (1 - es_r2) * rf_total
+
+        # Rescale RF predictions to match combined total
+        scaled_rf = rescale_predictions(rf_pred_dict, combined_total)
+
+        if(data.previous_forecast):
+            with metrics.stage(endpoint, "budget_adjustment"):
+                adjusted_category = adjustment.budget_adjustment(transactions, data.previous_forecast.category, scaled_rf)
+
+            if (sum(adjusted_category["adjusted_predictions"].values()) > allowance):
+                scaled = rescale_predictions(adjusted_category["adjusted_predictions"], allowance)
+                scaled_message  = append_scaling_message(adjusted_category["messages"], scaled)
+
+                return {
+                    "prediction_exceed": True,
+                    "es_success": True,
+                    "combined_total": sum(adjusted_category["adjusted_predictions"].values()),
+                    "categories": scaled,
+                    "adjustment_info": scaled_message,
+                    "rf_total": rf_total,
+                    "es_prediction": es_prediction,
+                    "es_r2_score": es_r2
+                }
+            else: 
+                return {
+                    "prediction_exceed": False,
+                    "es_success": True,
+                    "combined_total": sum(adjusted_category["adjusted_predictions"].values()),
+                    "categories": adjusted_category["adjusted_predictions"],
+                    "adjustment_info": adjusted_category["messages"],
+                    "rf_total": rf_total,
+                    "es_prediction": es_prediction,
+                    "es_r2_score": es_r2
+                }
+        else:
+            if(combined_total > allowance):
+                scaled = rescale_predictions(rf_pred_dict, allowance)
+                
+
+                return {
+                    "prediction_exceed": True,
+                    "es_success": True,
+                    "combined_total": combined_total,
+                    "categories": scaled,
+                    "rf_total": rf_total,
+                    "es_prediction": es_prediction,
+                    "es_r2_score": es_r2
+                } 
+            else:
+                return {
+                        "prediction_exceed": False,
+                        "es_success": True,
+                        "combined_total": combined_total,
+                        "categories": scaled_rf,
+                        "rf_total": rf_total,
+                        "es_prediction": es_prediction,
+                        "es_r2_score": es_r2
+                    } 
+    else:
+
+        if(rf_total > allowance):
+            scaled = rescale_predictions(rf_pred_dict, allowance)
+
+            return {
+            "prediction_exceed": True,
+            "es_success": False,
+            "es_message": str(es_prediction["message"]),
+            "categories": scaled,
+            "rf_total": rf_total
+        }
+
+        # Fall back to RF-only predictions
+        return {
+            "prediction_exceed": False,
+            "es_success": False,
+            "es_message": str(es_prediction["message"]),
+            "categories": rf_pred_dict,
+            "rf_total": rf_total
+        }
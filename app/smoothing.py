@@ -0,0 +1,113 @@
+import hashlib
+import os
+import numpy as np
+from app.cache import cache_from_env, shared_path
+
+SEASONAL_PERIODS = 30
+
+# Full re-optimization after this many folded-in days, or when the one-step
+# error since the last fit exceeds DRIFT_RATIO times the in-sample error
+REFIT_EVERY = int(os.environ.get("ES_REFIT_EVERY", 30))
+DRIFT_RATIO = float(os.environ.get("ES_DRIFT_RATIO", 2.0))
+DRIFT_MIN_DAYS = 7
+
+# Per-user Holt-Winters state; set ES_STATE_PATH to persist it in SQLite. With
+# a forecast pool or several uvicorn workers it defaults to a SQLite file they
+# all share, so a user's next request can fold in new days whichever process
+# it lands on
+state_store = cache_from_env("ES_STATE", max_entries=10000, ttl=None, default_path=shared_path("es_state"))
+
+def history_hash(series):
+    digest = hashlib.sha256()
+    digest.update(f"{series.index.tz}|".encode())
+    digest.update(series.index.asi8.tobytes())
+    digest.update(series.to_numpy(dtype='float64').tobytes())
+    return digest.hexdigest()
+
+def save_fitted_state(user_id, series, model_fit):
+    """Store the parameters and final components of a full statsmodels fit."""
+    if user_id is None:
+        return
+
+    params = model_fit.params
+    state_store.set(user_id, {
+        "alpha": float(params["smoothing_level"]),
+        "beta": float(params["smoothing_trend"]),
+        "gamma": float(params["smoothing_seasonal"]),
+        "level": float(model_fit.level.iloc[-1]),
+        "trend": float(model_fit.trend.iloc[-1]),
+        # The last m + 1 seasonal components, oldest first (see forecast_from_state)
+        "season": [float(s) for s in model_fit.season.iloc[-(SEASONAL_PERIODS + 1):]],
+        "n_obs": len(series),
+        "history_hash": history_hash(series),
+        "fit_mse": float(model_fit.sse / len(series)),
+        "days_since_fit": 0,
+        "sq_error_since_fit": 0.0
+    })
+
+def update_state(state, values):
+    """Fold new observations into the state with the additive Holt-Winters recursions."""
+    alpha, beta, gamma = state["alpha"], state["beta"], state["gamma"]
+    level, trend, season = state["level"], state["trend"], list(state["season"])
+    sq_error = 0.0
+
+    for y in values:
+        # Component from one seasonal cycle before the new observation
+        seasonal = season[-SEASONAL_PERIODS]
+        sq_error += (y - (level + trend + seasonal)) ** 2
+
+        new_level = alpha * (y - seasonal) + (1 - alpha) * (level + trend)
+        new_trend = beta * (new_level - level) + (1 - beta) * trend
+        season.append(gamma * (y - level - trend) + (1 - gamma) * seasonal)
+        season.pop(0)
+        level, trend = new_level, new_trend
+
+    return dict(
+        state, level=level, trend=trend, season=season,
+        days_since_fit=state["days_since_fit"] + len(values),
+        sq_error_since_fit=state["sq_error_since_fit"] + sq_error
+    )
+
+def forecast_from_state(state, test_size):
+    # statsmodels cycles its forecasts through the m components that precede
+    # the newest one (step h uses season[h % m] of the m + 1 kept); follow
+    # the same convention so state forecasts match a fresh fit
+    horizon = np.arange(1, test_size + 1)
+    season = np.asarray(state["season"])
+    return state["level"] + horizon * state["trend"] + season[horizon % SEASONAL_PERIODS]
+
+def needs_refit(state):
+    if state["days_since_fit"] >= REFIT_EVERY:
+        return True
+    if state["days_since_fit"] >= DRIFT_MIN_DAYS and state["fit_mse"] > 0:
+        recent_mse = state["sq_error_since_fit"] / state["days_since_fit"]
+        return recent_mse > DRIFT_RATIO * state["fit_mse"]
+    return False
+
+def incremental_forecast(user_id, series, test_size):
+    """
+    Forecast from the user's stored state after folding in the days added
+    since it was saved. Returns None when a full refit is due instead: no
+    state yet, history before the stored point changed, the refit schedule
+    is reached, or the one-step forecast error has drifted.
+    """
+    if user_id is None:
+        return None
+
+    state = state_store.get(user_id)
+    if state is None:
+        return None
+
+    n_obs = state["n_obs"]
+    if len(series) < n_obs or history_hash(series.iloc[:n_obs]) != state["history_hash"]:
+        return None
+
+    if len(series) > n_obs:
+        state = update_state(state, series.to_numpy(dtype='float64')[n_obs:])
+        if needs_refit(state):
+            return None
+        state["n_obs"] = len(series)
+        state["history_hash"] = history_hash(series)
+        state_store.set(user_id, state)
+
+    return forecast_from_state(state, test_size)
@@ -0,0 +1,128 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from app.ingest import Transactions
+
+# Kahan summation step of pandas' groupby sum, so running totals match the
+# sums Transactions.from_records computes over the same rows. SET expressions
+# read the row's values from before the update; SQLite turns the NaN an
+# infinite amount leaves in the compensation into NULL, which resets it to 0
+compensated_sum = (
+    "amount = amount + (excluded.amount - compensation), "
+    "compensation = IFNULL((amount + (excluded.amount - compensation)) - amount - (excluded.amount - compensation), 0.0)"
+)
+
+class TransactionStore:
+    """
+    Append-only transaction history in a local SQLite file, shared by every
+    worker that opens it.
+
+    Next to the raw rows it keeps the two aggregates the pipeline reads, the
+    expense total per user and date and per user, month and category, and
+    updates them as rows are appended. Loading a user's Transactions reads
+    only those aggregates, so its cost does not grow with the raw history.
+    Dates are grouped by their parsed timestamp, like Transactions.from_records.
+    Totals equal a groupby sum over the rows in append order; from_records
+    sums a day's rows in the order its date sort leaves them, which can
+    differ in the last bit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS transactions ("
+                "user_id TEXT NOT NULL, date TEXT NOT NULL, amount REAL NOT NULL, "
+                "type TEXT NOT NULL, category TEXT, name TEXT, description TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS transactions_user ON transactions (user_id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS daily_totals ("
+                "user_id TEXT NOT NULL, date TEXT NOT NULL, amount REAL NOT NULL, compensation REAL NOT NULL, "
+                "PRIMARY KEY (user_id, date))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS month_category_totals ("
+                "user_id TEXT NOT NULL, month INTEGER NOT NULL, category TEXT NOT NULL, "
+                "amount REAL NOT NULL, compensation REAL NOT NULL, "
+                "PRIMARY KEY (user_id, month, category))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per call keeps the store safe across threads
+        # and workers. sqlite3's own context manager only commits, so close it here
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def append(self, records):
+        """Store transaction dicts (userId, totalAmount, category, type, date) and fold them into the totals."""
+        if not records:
+            return 0
+        df = pd.DataFrame(records)
+        for column in ("category", "name", "description"):
+            if column not in df.columns:
+                df[column] = None
+        dates = pd.to_datetime(df["date"])
+        df["date"] = [date.isoformat() for date in dates]
+        df["month"] = (dates.dt.year * 100 + dates.dt.month).to_numpy()
+        df = df.astype(object).where(df.notna(), None)
+        expenses = df[df["type"] == "Expense"]
+
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO transactions (user_id, date, amount, type, category, name, description) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                df[["userId", "date", "totalAmount", "type", "category", "name", "description"]].itertuples(index=False)
+            )
+            conn.executemany(
+                "INSERT INTO daily_totals (user_id, date, amount, compensation) VALUES (?, ?, ?, 0.0) "
+                f"ON CONFLICT (user_id, date) DO UPDATE SET {compensated_sum}",
+                expenses[["userId", "date", "totalAmount"]].itertuples(index=False)
+            )
+            conn.executemany(
+                "INSERT INTO month_category_totals (user_id, month, category, amount, compensation) VALUES (?, ?, ?, ?, 0.0) "
+                f"ON CONFLICT (user_id, month, category) DO UPDATE SET {compensated_sum}",
+                expenses[expenses["category"].notna()][["userId", "month", "category", "totalAmount"]].itertuples(index=False)
+            )
+        return len(df)
+
+    def transactions(self, user_id):
+        """The user's Transactions from the stored totals, or None if nothing was appended for them."""
+        with self._connect() as conn:
+            daily = conn.execute(
+                "SELECT date, amount FROM daily_totals WHERE user_id = ?", (user_id,)
+            ).fetchall()
+            by_month = conn.execute(
+                "SELECT month, category, amount FROM month_category_totals WHERE user_id = ?", (user_id,)
+            ).fetchall()
+            if not daily and not by_month:
+                if conn.execute("SELECT 1 FROM transactions WHERE user_id = ? LIMIT 1", (user_id,)).fetchone() is None:
+                    return None
+
+        dates = pd.to_datetime([date for date, _ in daily])
+        order = np.argsort(dates.to_numpy(), kind="stable")
+        # Same month x category layout as the unstacked groupby, zeros where a month has no such expense
+        by_month = pd.DataFrame(by_month, columns=["month", "category", "amount"])
+        table = by_month.pivot(index="month", columns="category", values="amount").sort_index().sort_index(axis=1).fillna(0.0)
+
+        return Transactions(
+            user_id=user_id,
+            daily_dates=dates[order].rename("date"),
+            daily_amounts=np.array([amount for _, amount in daily], dtype=np.float64)[order],
+            months=table.index.to_numpy(dtype=np.int64),
+            categories=table.columns.to_numpy(),
+            category_totals=table.to_numpy(dtype=np.float64)
+        )
+
+def store_from_env():
+    """TransactionStore at TRANSACTION_STORE_PATH, or None when it is not set."""
+    path = os.environ.get("TRANSACTION_STORE_PATH")
+    return TransactionStore(path) if path else None
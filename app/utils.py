@@ -0,0 +1,41 @@
+import numpy as np
+
+age_mapping = {"Under 18": 1, "18-20": 2, "21-23": 3, "24-26": 4, "27 and above": 5}
+year_level_mapping = {"Freshman": 1, "Sophomore": 2, "Junior": 3, "Senior": 4}
+roommates_mapping = {
+    "With family": 0, "I live alone": 1, "I live with 1 roommate": 2,
+    "I live with 2-3 roommates": 3, "I live with more than 3 roommates": 4
+}
+study_hours_mapping = {
+    "Less then 10 hours": 1, "10-20 hours": 2, "21-30 hours": 3,
+    "31-40 hours": 4, "More then 40 hours": 5
+}
+income_mapping = {
+    "Less than P12,030": 1, "P12,031 - P24,060": 2, "P24,061 - P48,120": 3,
+    "P48,121 - P84,210": 4, "P84,211 - P144,360": 5, "P144,361 - P240,600": 6,
+    "More than P240,601": 7
+}
+going_home_mapping = {
+    "Not at all": 1, "Rarely": 2, "Sometimes": 3, "Often": 4, "Always": 5
+}
+
+# Ordinal fields and the mapping applied to each
+ordinal_mappings = {
+    "Age_Group": age_mapping,
+    "Year_Level": year_level_mapping,
+    "Roommates": roommates_mapping,
+    "Hours_of_Study_per_Week": study_hours_mapping,
+    "Family_Monthly_Income": income_mapping,
+    "Frequency_of_Going_Home": going_home_mapping
+}
+
+def convert_to_numeric(value):
+    if isinstance(value, str):
+        value = value.lower().replace(',', '').strip()
+        if 'k' in value:
+            return float(value.replace('k', '')) * 1000
+        try:
+            return float(value)
+        except ValueError:
+            return np.nan
+    return value
@@ -0,0 +1,83 @@
+import logging
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+# Both are in requirements.txt but kept optional: without msgpack, MessagePack
+# bodies are answered with 415; without orjson, responses go through
+# jsonable_encoder as before. Either fallback is logged at startup
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+    logger.warning("event=optional_dependency_missing package=msgpack fallback=415_for_msgpack_bodies")
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    logger.warning("event=optional_dependency_missing package=orjson fallback=jsonable_encoder")
+
+msgpack_media_types = {"application/msgpack", "application/x-msgpack", "application/vnd.msgpack"}
+
+def media_type(request: Request):
+    return request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+class DecodedRequest(Request):
+    """
+    A request whose binary body was already decoded. It presents itself as
+    JSON, so FastAPI validates the decoded object against the endpoint's
+    body model exactly as it would a JSON body.
+    """
+
+    def __init__(self, request: Request, body: bytes, decoded):
+        headers = [(name, value) for name, value in request.scope["headers"] if name != b"content-type"]
+        super().__init__(dict(request.scope, headers=headers + [(b"content-type", b"application/json")]), request.receive)
+        self._raw_body = body
+        self._decoded = decoded
+
+    async def body(self):
+        return self._raw_body
+
+    async def json(self):
+        return self._decoded
+
+class WireRoute(APIRoute):
+    """Route that also accepts MessagePack request bodies, chosen by Content-Type."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request):
+            if media_type(request) in msgpack_media_types:
+                if msgpack is None:
+                    return JSONResponse(status_code=415, content={"detail": "MessagePack bodies need the msgpack package"})
+                body = await request.body()
+                try:
+                    decoded = msgpack.unpackb(body)
+                except Exception:
+                    return JSONResponse(status_code=400, content={"detail": "Malformed MessagePack body"})
+                request = DecodedRequest(request, body, decoded)
+            return await handler(request)
+
+        return route_handler
+
+def json_response(content):
+    """
+    JSON response for the prediction payloads. orjson writes the long
+    es_prediction float lists (and numpy values) directly, without the
+    per-element walk of jsonable_encoder.
+    """
+    if orjson is not None:
+        try:
+            return Response(
+                orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS),
+                media_type="application/json"
+            )
+        except TypeError:
+            # Values orjson does not know fall back to FastAPI's encoder
+            pass
+    return JSONResponse(content=jsonable_encoder(content))
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+from multiprocessing import get_context
+from types import SimpleNamespace
+from app import Exponential
+
+class ForecastPool:
+    """
+    Runs Exponential.forecast_expenses in worker processes so the statsmodels
+    fit does not hold the server's GIL.
+
+    With size 0 the forecasts run on threads of the server process instead,
+    which costs no extra memory when there are already several uvicorn
+    workers. Either way forecast() gives up after timeout seconds and
+    returns an unsuccessful forecast, which the endpoint turns into its
+    RF-only fallback; the fit itself keeps running in its worker. Before
+    start() (scripts, benchmarks) forecasts run inline without a deadline.
+    """
+
+    def __init__(self, size=0, timeout=10.0):
+        self.size = size
+        self.timeout = timeout
+        self.executor = None
+        self.timeouts = 0
+
+    def start(self):
+        if self.executor is not None:
+            return
+        if self.size <= 0:
+            self.executor = ThreadPoolExecutor(thread_name_prefix="forecast")
+            return
+        # spawn rather than fork: the server process already runs threads
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=get_context("spawn"),
+            initializer=Exponential.warm_up
+        )
+        # Start every worker now instead of on the first requests
+        for future in [self.executor.submit(os.getpid) for _ in range(self.size)]:
+            future.result()
+
+    @property
+    def running(self):
+        """False once a started process pool is shut down or broken by a worker dying."""
+        if self.size <= 0:
+            return True
+        return self.executor is not None and not getattr(self.executor, "_broken", False)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def submit(self, transactions, previous_forecast):
+        if self.executor is None:
+            future = Future()
+            future.set_result(Exponential.forecast_expenses(transactions, previous_forecast))
+            return future
+
+        # forecast_expenses only reads attributes of previous_forecast; a plain
+        # namespace pickles without importing the API models in the worker
+        if previous_forecast is not None:
+            previous_forecast = SimpleNamespace(**previous_forecast.model_dump())
+        return self.executor.submit(Exponential.forecast_expenses, transactions, previous_forecast)
+
+    def result(self, future, timeout=None, deadline=None):
+        """
+        The forecast, or an unsuccessful one after timeout seconds. With a
+        deadline (a time.monotonic() value) it waits only until then, so
+        several futures can share one timeout.
+        """
+        wait = timeout if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return future.result(timeout=wait)
+        except TimeoutError:
+            future.cancel()
+            self.timeouts += 1
+            return {
+                "success": False,
+                "message": f"Forecast did not finish within the {timeout:g}s deadline"
+            }
+
+    def forecast(self, transactions, previous_forecast):
+        return self.result(self.submit(transactions, previous_forecast), self.timeout)
+
+    def forecast_many(self, transactions, previous_forecasts):
+        """forecast() for several users at once, all within one timeout."""
+        futures = [self.submit(txns, previous) for txns, previous in zip(transactions, previous_forecasts)]
+        deadline = time.monotonic() + self.timeout
+        return [self.result(future, self.timeout, deadline) for future in futures]
+
+def pool_from_env():
+    return ForecastPool(
+        size=int(os.environ.get("FORECAST_POOL_SIZE", 0)),
+        timeout=float(os.environ.get("FORECAST_TIMEOUT", 10))
+    )
+
+class AdmissionController:
+    """
+    Bounds how many requests are in the ES stage at once.
+
+    Up to max_concurrent requests forecast together and up to max_queue more
+    wait for a slot, each for at most queue_timeout seconds. A request that
+    finds the queue full, or waits out the timeout, is shed: overflow
+    "fallback" answers it with the RF-only prediction, "reject" with a 503
+    whose Retry-After is retry_after seconds. With max_concurrent 0 every
+    request is admitted, as before.
+    """
+
+    def __init__(self, max_concurrent=0, max_queue=0, queue_timeout=2.0, overflow="fallback", retry_after=1):
+        if overflow not in ("fallback", "reject"):
+            raise ValueError(f"overflow must be 'fallback' or 'reject', not {overflow!r}")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.overflow = overflow
+        self.retry_after = retry_after
+        self.active = 0
+        self.queued = 0
+        self.shed = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if there is room. False if the request is shed."""
+        with self.condition:
+            if self.max_concurrent <= 0 or (self.active < self.max_concurrent and self.queued == 0):
+                self.active += 1
+                return True
+            if self.queued >= self.max_queue:
+                self.shed += 1
+                return False
+
+            self.queued += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed += 1
+                        return False
+                    self.condition.wait(remaining)
+            finally:
+                self.queued -= 1
+            self.active += 1
+            return True
+
+    @property
+    def saturated(self):
+        """True while every slot and queue place is taken, so new requests are shed."""
+        return self.max_concurrent > 0 and self.active >= self.max_concurrent and self.queued >= self.max_queue
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    @contextmanager
+    def slot(self):
+        """Yields whether the request was admitted; an admitted request holds its slot until the block exits."""
+        admitted = self.acquire()
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self.release()
+
+def admission_from_env():
+    return AdmissionController(
+        max_concurrent=int(os.environ.get("ES_MAX_CONCURRENT", 0)),
+        max_queue=int(os.environ.get("ES_MAX_QUEUE", 0)),
+        queue_timeout=float(os.environ.get("ES_QUEUE_TIMEOUT", 2)),
+        overflow=os.environ.get("ES_OVERFLOW", "fallback"),
+        retry_after=int(os.environ.get("ES_RETRY_AFTER", 1))
+    )
@@ -0,0 +1,87 @@
+"""
+Checks that budget_adjustment, now a wrapper over the array-based
+adjustment.Adjustment, returns what the per-category loop it replaced
+returned, then times the loop against one Adjustment over every user, with
+and without rendering the messages.
+
+The users are windows of the bundled transactions ending on different days,
+each with a previous and a current forecast drawn at random, including
+categories without a previous forecast and forecasts far off the actual.
+
+Run from the repository root:
+    python -m benchmarks.bench_adjustment [--users 20000]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from types import SimpleNamespace
+from app import adjustment
+from app.ingest import Transactions
+from benchmarks.payloads import load_transactions
+
+def loop_adjustment(transactions, previous_forecast, current_forecast):
+    # The per-category loop budget_adjustment ran before Adjustment
+    latest_date = transactions.latest_date
+    previous_month = (latest_date - pd.DateOffset(months=1)).month
+    previous_month_year = (latest_date - pd.DateOffset(months=1)).year
+    actuals = transactions.month_totals(previous_month_year, previous_month + 1)
+    confidence_scores, adjusted_predictions, messages = {}, {}, {}
+    for category, (forecast_key, label) in adjustment.category_map.items():
+        actual = actuals.get(label, 0)
+        previous_prediction = getattr(previous_forecast, forecast_key, 0)
+        current_prediction = current_forecast.get(category, 0)
+        if previous_prediction == 0:
+            confidence = 0
+        else:
+            confidence = max(0, 1 - (abs(actual - previous_prediction) / previous_prediction))
+        adjusted = (confidence * current_prediction) + ((1 - confidence) * actual)
+        confidence_scores[category] = confidence
+        adjusted_predictions[category] = adjusted
+        messages[category] = adjustment.generate_adjustment_message(
+            label, actual, previous_prediction, current_prediction, adjusted, confidence)
+    return {"success": True, "confidence_scores": confidence_scores,
+            "adjusted_predictions": adjusted_predictions, "messages": messages}
+
+def make_users(n_users, seed=0):
+    rng = np.random.default_rng(seed)
+    records = load_transactions()
+    dates = sorted({record["date"] for record in records})
+    histories = {}
+    users = []
+    for _ in range(n_users):
+        end = dates[rng.integers(30, len(dates))]
+        if end not in histories:
+            histories[end] = Transactions.from_records([r for r in records if r["date"] <= end])
+        previous = {field: float(rng.choice([0.0, rng.uniform(100, 5000)], p=[0.1, 0.9]))
+                    for field, _ in adjustment.category_map.values()}
+        current = {category: float(rng.uniform(100, 5000)) for category in adjustment.categories}
+        users.append((histories[end], SimpleNamespace(**previous), current))
+    return users
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=20000)
+    args = parser.parse_args()
+
+    users = make_users(args.users)
+    mismatches = sum(adjustment.budget_adjustment(*user) != loop_adjustment(*user) for user in users)
+    print(f"{len(users) - mismatches}/{len(users)} users identical to the per-category loop")
+
+    loop, loop_seconds = timed(lambda: [loop_adjustment(*user) for user in users])
+    batch, batch_seconds = timed(lambda: adjustment.Adjustment(
+        np.array([adjustment.last_month_actuals(transactions) for transactions, _, _ in users]),
+        adjustment.previous_matrix([previous for _, previous, _ in users]),
+        adjustment.current_matrix([current for _, _, current in users])
+    ))
+    _, message_seconds = timed(lambda: [batch.messages(row) for row in range(len(users))])
+
+    assert np.array_equal(batch.adjusted, [list(result["adjusted_predictions"].values()) for result in loop])
+    print(f"per-category loop with messages: {loop_seconds * 1e6 / len(users):8.2f} us/user")
+    print(f"Adjustment, numbers only:        {batch_seconds * 1e6 / len(users):8.2f} us/user")
+    print(f"Adjustment, then messages:       {(batch_seconds + message_seconds) * 1e6 / len(users):8.2f} us/user")
@@ -0,0 +1,69 @@
+"""
+Measures cold start of the API: import time, time until /ready answers 200,
+and latency of the first and second /predict calls.
+
+Run from the repository root:
+    python -m benchmarks.bench_cold_start
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from benchmarks.payloads import BASE_DIR, sample_payload
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def import_time():
+    code = "import time; start = time.perf_counter(); import app.main; print(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+def post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - start
+
+def wait_until_ready(url, timeout=120):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url) as response:
+                if response.status == 200:
+                    return json.loads(response.read())
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.01)
+    raise TimeoutError("server did not become ready")
+
+if __name__ == "__main__":
+    payload = sample_payload()
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BASE_DIR
+    )
+    try:
+        readiness = wait_until_ready(f"{base_url}/ready")
+        ready_time = time.perf_counter() - start
+        first = post(f"{base_url}/predict", payload)
+        second = post(f"{base_url}/predict", payload)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"import app.main:        {import_time() * 1e3:9.1f} ms")
+    print(f"process start to ready: {ready_time * 1e3:9.1f} ms (warm-up {readiness['warm_up_seconds'] * 1e3:.1f} ms)")
+    print(f"first /predict:         {first * 1e3:9.1f} ms")
+    print(f"second /predict:        {second * 1e3:9.1f} ms (same history)")
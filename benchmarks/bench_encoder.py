@@ -0,0 +1,67 @@
+"""
+Checks FeatureEncoder against preprocess_input and times both.
+
+Run from the repository root:
+    python -m benchmarks.bench_encoder
+"""
+import os
+import time
+import numpy as np
+import pandas as pd
+from app.main import preprocess_input, models, UserInput
+
+encoder = models.active.encoder
+reference_columns = encoder.columns
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+profiles_path = os.path.join(BASE_DIR, "dataset", "Student-Spending-Habits.csv")
+
+def load_profiles():
+    df = pd.read_csv(profiles_path, dtype=str).dropna()
+    profiles = df[list(UserInput.model_fields)].to_dict("records")
+
+    # Values the survey never produced, to cover the fallback branches
+    edge_cases = []
+    for profile in profiles[:5]:
+        edge = dict(profile)
+        edge["Age_Group"] = "Unknown"
+        edge["Monthly_Allowance"] = "12.5k"
+        edge["In_relationship"] = "yes"
+        edge["Have_Job"] = "Maybe"
+        edge_cases.append(edge)
+        edge = dict(profile)
+        edge["Monthly_Allowance"] = "not a number"
+        edge["Family_Monthly_Income"] = "Yes"
+        edge_cases.append(edge)
+
+    return profiles + edge_cases
+
+def check_equivalence(profiles):
+    for profile in profiles:
+        expected = preprocess_input(profile, reference_columns).to_numpy(dtype=np.float64)[0]
+        actual = encoder.encode(profile)
+        np.testing.assert_array_equal(actual, expected, err_msg=str(profile))
+
+    batch = encoder.encode_many(profiles)
+    expected = np.vstack([encoder.encode(profile) for profile in profiles])
+    np.testing.assert_array_equal(batch, expected)
+
+def time_it(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+if __name__ == "__main__":
+    profiles = load_profiles()
+    check_equivalence(profiles)
+    print(f"Encoder matches preprocess_input on {len(profiles)} profiles")
+
+    profile = profiles[0]
+    pandas_time = time_it(lambda: preprocess_input(profile, reference_columns), 200)
+    encoder_time = time_it(lambda: encoder.encode(profile), 2000)
+    batch_time = time_it(lambda: encoder.encode_many(profiles), 20)
+
+    print(f"preprocess_input (1 row):   {pandas_time * 1e6:10.1f} us")
+    print(f"encoder.encode (1 row):     {encoder_time * 1e6:10.1f} us")
+    print(f"encoder.encode_many ({len(profiles)} rows): {batch_time * 1e3:8.2f} ms")
@@ -0,0 +1,66 @@
+"""
+Compares the current model version's forest, loaded the way the server
+loads it, with the same version's pickled MultiOutputRegressor, from
+single-row requests to bulk scoring batches. Batches of
+CompiledForest.sklearn_rows rows or more take the sklearn traversal path.
+
+Run from the repository root:
+    python -m benchmarks.bench_forest
+"""
+import os
+import pickle
+import time
+import numpy as np
+import pandas as pd
+from app.artifacts import LoadedModel, current_version, version_paths
+from app.forest import CompiledForest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+csv_path = os.path.join(BASE_DIR, "dataset", "Student-Spending-Habits_PreProcessed.csv")
+
+def feature_columns():
+    # Only for a legacy export without its schema file
+    return pd.read_csv(csv_path, nrows=0).drop(columns=[
+        "Living_Expenses", "Food_and_Dining_Expenses",
+        "Transportation_Expenses", "Leisure_and_Entertainment_Expenses", "Academic_Expenses"
+    ]).columns.tolist()
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+if __name__ == "__main__":
+    # The version CURRENT points at, or the legacy export, as the server picks it
+    version = current_version()
+    model_path = version_paths(version)["model"]
+    if not os.path.exists(model_path):
+        raise SystemExit(f"Model version {version} has no pickled model to compare with ({model_path})")
+
+    loaded = LoadedModel.load(version, "mmap", fields=[], fallback_columns=feature_columns)
+    forest = loaded.forest
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    print(f"Model version {loaded.version}: {forest.n_trees} trees, {forest.n_nodes} nodes, {forest.n_targets} targets")
+
+    X = pd.read_csv(csv_path)[loaded.manifest["feature_columns"]]
+    # Tile the training rows up to the largest batch size
+    X = pd.concat([X] * (5000 // len(X) + 1), ignore_index=True)
+
+    for n_rows in [1, 10, CompiledForest.sklearn_rows - 1, CompiledForest.sklearn_rows, 100, 1000, 5000]:
+        batch = X.iloc[:n_rows]
+        batch_array = batch.to_numpy()
+
+        expected = model.predict(batch)
+        actual = forest.predict(batch_array)
+        assert np.array_equal(expected, actual), "compiled forest disagrees with sklearn"
+
+        repeat = 20 if n_rows < 100 else 5
+        sklearn_time = best_of(lambda: model.predict(batch), repeat)
+        compiled_time = best_of(lambda: forest.predict(batch_array), repeat)
+
+        print(f"{n_rows:5d} rows  sklearn {sklearn_time * 1e3:9.2f} ms  "
+              f"compiled {compiled_time * 1e3:9.2f} ms  speedup {sklearn_time / compiled_time:6.2f}x")
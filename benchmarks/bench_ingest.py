@@ -0,0 +1,83 @@
+"""
+Checks that the shared Transactions ingestion gives the same daily series and
+previous-month category totals as the two separate DataFrame passes it
+replaced, then times both on histories of increasing length.
+
+Run from the repository root:
+    python -m benchmarks.bench_ingest
+"""
+import time
+import numpy as np
+import pandas as pd
+from app.ingest import Transactions
+from benchmarks.payloads import load_transactions
+
+def separate_passes(data_json):
+    # What forecast_expenses and budget_adjustment each did before ingestion was shared
+    df = pd.DataFrame(data_json)
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.sort_values(by='date').reset_index(drop=True)
+    df = df[df['type'] == 'Expense']
+    daily = df.groupby('date')['totalAmount'].sum()
+
+    df = pd.DataFrame(data_json)
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.sort_values(by='date').reset_index(drop=True)
+    df = df[df['type'] == 'Expense']
+    latest_date = df['date'].max()
+    previous_month = (latest_date - pd.DateOffset(months=1)).month
+    previous_month_year = (latest_date - pd.DateOffset(months=1)).year
+    prev_month_df = df[(df['date'].dt.month == previous_month + 1) &
+                       (df['date'].dt.year == previous_month_year)]
+    grouped = prev_month_df.groupby('category')['totalAmount'].sum().reset_index()
+    return daily, dict(zip(grouped['category'], grouped['totalAmount']))
+
+def single_pass(data_json):
+    transactions = Transactions.from_records(data_json)
+    latest_date = transactions.latest_date
+    previous_month = (latest_date - pd.DateOffset(months=1)).month
+    previous_month_year = (latest_date - pd.DateOffset(months=1)).year
+    return transactions.daily_series(), transactions.month_totals(previous_month_year, previous_month + 1)
+
+def history(records, years):
+    """Repeat the bundled months back in time until the history spans the given years."""
+    df = pd.DataFrame(records)
+    dates = pd.to_datetime(df['date'])
+    span = dates.max().normalize() - dates.min().normalize() + pd.Timedelta(days=1)
+    copies = []
+    for i in range(int(np.ceil(years * 365 / span.days))):
+        copy = df.copy()
+        copy['date'] = (dates - i * span).dt.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True).to_dict('records')
+
+def best_of(fn, repeat=10):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+if __name__ == "__main__":
+    records = load_transactions()
+
+    for years in [0.4, 1, 2, 4]:
+        data_json = history(records, years)
+        expected_daily, expected_actuals = separate_passes(data_json)
+        daily, actuals = single_pass(data_json)
+
+        assert expected_daily.index.equals(daily.index)
+        assert np.array_equal(expected_daily.to_numpy(), daily.to_numpy())
+        for category, total in expected_actuals.items():
+            assert actuals[category] == total, category
+        assert all(total == 0 for category, total in actuals.items() if category not in expected_actuals)
+
+        before = best_of(lambda: separate_passes(data_json))
+        after = best_of(lambda: single_pass(data_json))
+        print(f"{len(data_json):6d} transactions  two passes {before * 1e3:7.2f} ms  "
+              f"single pass {after * 1e3:7.2f} ms  speedup {before / after:5.2f}x")
+
+    # A history ending in January selects no month (month 13), in both versions
+    january = [dict(r, date=r['date'].replace('2025-05', '2026-01')) for r in records]
+    assert separate_passes(january)[1] == {} and single_pass(january)[1] == {}
@@ -0,0 +1,204 @@
+"""
+Latency and throughput of /predict and /predict/batch, swept over history
+length, batch size and whether a previous_forecast is sent.
+
+The app is driven in-process through FastAPI's TestClient and/or over a
+local uvicorn. Forecast and smoothing-state caches are disabled unless
+--cache is given, so every request pays for the full pipeline. Results are
+written as JSON; pass --compare with an earlier file to print the change.
+
+Run from the repository root:
+    python -m benchmarks.bench_predict --output results.json
+    python -m benchmarks.bench_predict --mode uvicorn --concurrency 4 --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from benchmarks.bench_cold_start import free_port, wait_until_ready
+from benchmarks.payloads import BASE_DIR, load_profiles, predict_payload
+
+CACHE_ENV = {"FORECAST_CACHE_SIZE": "0", "ES_STATE_SIZE": "0"}
+
+def build_requests(profiles, days, batch_size, with_previous_forecast, count):
+    """count request bodies; each student gets their own seeded history."""
+    bodies = []
+    for i in range(count):
+        items = [
+            predict_payload(profiles[(i * batch_size + j) % len(profiles)], days, with_previous_forecast,
+                            user_id=f"bench-{i}-{j}", seed=i * batch_size + j)
+            for j in range(batch_size)
+        ]
+        bodies.append(items[0] if batch_size == 1 else items)
+    return bodies
+
+def es_successes(body):
+    results = body if isinstance(body, list) else [body]
+    return sum(1 for result in results if result.get("es_success")), len(results)
+
+class InProcessClient:
+    def __init__(self):
+        from fastapi.testclient import TestClient
+        from app.main import app
+        self.client = TestClient(app)
+        self.client.__enter__()
+
+    def post(self, path, body):
+        response = self.client.post(path, json=body)
+        return response.status_code, response.json() if response.status_code == 200 else None
+
+    def close(self):
+        self.client.__exit__(None, None, None)
+
+class UvicornClient:
+    def __init__(self, env):
+        port = free_port()
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning"],
+            cwd=BASE_DIR, env=dict(os.environ, **env)
+        )
+        wait_until_ready(f"{self.base_url}/ready")
+
+    def post(self, path, body):
+        request = urllib.request.Request(
+            self.base_url + path, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+    def close(self):
+        self.server.terminate()
+        self.server.wait()
+
+def run_scenario(client, bodies, warmup, concurrency):
+    path = "/predict/batch" if isinstance(bodies[0], list) else "/predict"
+    for body in bodies[:warmup]:
+        client.post(path, body)
+
+    def timed(body):
+        start = time.perf_counter()
+        status, response = client.post(path, body)
+        return time.perf_counter() - start, status, response
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed, bodies[warmup:]))
+    wall = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _, _ in outcomes]) * 1e3
+    succeeded = [response for _, status, response in outcomes if status == 200]
+    es_ok, es_total = map(sum, zip(*[es_successes(r) for r in succeeded])) if succeeded else (0, 0)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "endpoint": path,
+        "requests": len(outcomes),
+        "errors": len(outcomes) - len(succeeded),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "mean_ms": float(latencies.mean()),
+        "requests_per_second": len(outcomes) / wall,
+        "students_per_second": len(outcomes) * (len(bodies[0]) if path == "/predict/batch" else 1) / wall,
+        "es_success_rate": es_ok / es_total if es_total else 0.0
+    }
+
+def scenario_key(result):
+    return (result["mode"], result["history_days"], result["batch_size"], result["previous_forecast"], result["concurrency"])
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {scenario_key(r): r for r in json.load(f)["results"]}
+    print(f"{'scenario':48s} {'p50 before':>11s} {'p50 after':>10s} {'change':>8s} {'rps change':>11s}")
+    for result in results:
+        before = baseline.get(scenario_key(result))
+        if before is None:
+            continue
+        label = "{} days={} batch={} prev={} c={}".format(*scenario_key(result))
+        print(f"{label:48s} {before['p50_ms']:9.1f}ms {result['p50_ms']:8.1f}ms "
+              f"{result['p50_ms'] / before['p50_ms'] - 1:+7.1%} "
+              f"{result['requests_per_second'] / before['requests_per_second'] - 1:+10.1%}")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="inprocess")
+    parser.add_argument("--history-days", type=int, nargs="+", default=[30, 90, 180, 365, 730])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--previous-forecast", choices=["with", "without", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=20, help="timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent clients")
+    parser.add_argument("--cache", action="store_true", help="keep the forecast and smoothing-state caches on")
+    parser.add_argument("--output", help="JSON file for the results (default: stdout)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    env = {} if args.cache else CACHE_ENV
+    # Cache sizes are read when app modules are imported
+    os.environ.update(env)
+    # statsmodels warns about the inferred daily frequency on every fit
+    warnings.simplefilter("ignore")
+
+    profiles = load_profiles()
+    previous_options = {"with": [True], "without": [False], "both": [False, True]}[args.previous_forecast]
+    modes = ["inprocess", "uvicorn"] if args.mode == "both" else [args.mode]
+
+    results = []
+    for mode in modes:
+        client = InProcessClient() if mode == "inprocess" else UvicornClient(env)
+        try:
+            for days in args.history_days:
+                for batch_size in args.batch_sizes:
+                    for with_previous in previous_options:
+                        bodies = build_requests(profiles, days, batch_size, with_previous, args.warmup + args.requests)
+                        result = run_scenario(client, bodies, args.warmup, args.concurrency)
+                        result.update(mode=mode, history_days=days, batch_size=batch_size,
+                                      previous_forecast=with_previous, concurrency=args.concurrency)
+                        results.append(result)
+                        print(f"{mode:9s} days={days:4d} batch={batch_size:3d} prev={with_previous!s:5s} "
+                              f"p50 {result['p50_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  "
+                              f"{result['requests_per_second']:7.2f} req/s", file=sys.stderr)
+        finally:
+            client.close()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "caches": args.cache,
+            "env": {name: os.environ[name] for name in ["FORECAST_POOL_SIZE", "FORECAST_TIMEOUT"] if name in os.environ}
+        },
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        compare(results, args.compare)
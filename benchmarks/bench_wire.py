@@ -0,0 +1,61 @@
+"""
+/predict with the transaction history sent as a list of objects (JSON),
+as parallel arrays (columnar JSON) and as columnar MessagePack. Checks that
+the three encodings get the same response, then reports body size and
+latency per history length.
+
+Caches are disabled so every request pays for parsing and the pipeline.
+
+Run from the repository root:
+    python -m benchmarks.bench_wire [--history-days 90 365 730 1460] [--requests 20]
+"""
+import argparse
+import json
+import os
+import time
+import warnings
+import numpy as np
+from benchmarks.bench_predict import CACHE_ENV
+from benchmarks.payloads import columnar_transactions, load_profiles, predict_payload
+
+def encodings(payload):
+    import msgpack
+    columnar = dict(payload, transactions=columnar_transactions(payload["transactions"]))
+    return {
+        "rows": (json.dumps(payload).encode(), "application/json"),
+        "columnar": (json.dumps(columnar).encode(), "application/json"),
+        "msgpack": (msgpack.packb(columnar), "application/msgpack")
+    }
+
+def timed_post(client, body, content_type, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.post("/predict", content=body, headers={"Content-Type": content_type})
+        latencies.append(time.perf_counter() - start)
+    return response, np.array(latencies) * 1e3
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--history-days", type=int, nargs="+", default=[90, 365, 730, 1460])
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.update(CACHE_ENV, RF_CACHE_SIZE="0")
+    warnings.simplefilter("ignore")
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    profile = load_profiles()[0]
+    print(f"{'days':>5s} {'encoding':9s} {'body':>9s} {'p50':>9s} {'mean':>9s}")
+    with TestClient(app) as client:
+        for days in args.history_days:
+            payload = predict_payload(profile, days, with_previous_forecast=True, seed=days)
+            responses = {}
+            for name, (body, content_type) in encodings(payload).items():
+                response, latencies = timed_post(client, body, content_type, args.requests)
+                responses[name] = response.json()
+                print(f"{days:5d} {name:9s} {len(body) / 1024:7.1f}kB "
+                      f"{np.percentile(latencies, 50):7.1f}ms {latencies.mean():7.1f}ms")
+            if not responses["rows"] == responses["columnar"] == responses["msgpack"]:
+                raise SystemExit(f"responses differ between encodings at {days} days")
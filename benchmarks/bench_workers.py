@@ -0,0 +1,106 @@
+"""
+Memory per uvicorn worker as the worker count grows, for each
+MODEL_LOAD_MODE. Reports RSS (counts shared pages in every process) and
+PSS (splits shared pages between the processes mapping them), read from
+/proc, so this runs on Linux only.
+
+Forecast pools are disabled (FORECAST_POOL_SIZE=0) so only the API
+workers are measured.
+
+Run from the repository root:
+    python -m benchmarks.bench_workers [--workers 1 2 4 8] [--output memory.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from benchmarks.bench_cold_start import free_port, post, wait_until_ready
+from benchmarks.payloads import BASE_DIR, sample_payload
+
+def memory_kb(pid):
+    """Rss, Pss and their shared/private split from /proc/<pid>/smaps_rollup, in kB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The process name may contain spaces; the parent pid follows the closing parenthesis
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline") as f:
+                cmdline = f.read()
+        except (OSError, IndexError):
+            continue
+        if ppid == pid and "resource_tracker" not in cmdline:
+            children.append(int(entry))
+    return children
+
+def measure(mode, n_workers, payload, requests_per_worker):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, MODEL_LOAD_MODE=mode, FORECAST_POOL_SIZE="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(n_workers), "--log-level", "warning"],
+        cwd=BASE_DIR, env=env
+    )
+    try:
+        wait_until_ready(f"{base_url}/ready")
+        # /ready only shows that one worker is up; wait for all of them, then
+        # send traffic so each has served requests
+        deadline = time.perf_counter() + 120
+        workers = child_pids(server.pid) if n_workers > 1 else [server.pid]
+        while len(workers) < n_workers and time.perf_counter() < deadline:
+            time.sleep(0.1)
+            workers = child_pids(server.pid)
+        time.sleep(1.0)
+        for _ in range(requests_per_worker * n_workers):
+            post(f"{base_url}/predict", payload)
+
+        per_worker = [memory_kb(pid) for pid in workers]
+    finally:
+        server.terminate()
+        server.wait()
+
+    total = lambda key: sum(worker[key] for worker in per_worker)
+    return {
+        "mode": mode,
+        "workers": n_workers,
+        "rss_mb_per_worker": total("Rss") / len(per_worker) / 1024,
+        "pss_mb_per_worker": total("Pss") / len(per_worker) / 1024,
+        "private_mb_per_worker": (total("Private_Clean") + total("Private_Dirty")) / len(per_worker) / 1024,
+        "pss_mb_total": total("Pss") / 1024
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory per uvicorn worker by model load mode.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", default=["pickle", "mmap"], choices=["pickle", "mmap"])
+    parser.add_argument("--requests-per-worker", type=int, default=3)
+    parser.add_argument("--output", help="JSON file for the results")
+    args = parser.parse_args()
+
+    payload = sample_payload()
+    results = []
+    print(f"{'mode':7s} {'workers':>7s} {'RSS/worker':>11s} {'PSS/worker':>11s} {'private/worker':>15s} {'PSS total':>10s}")
+    for mode in args.modes:
+        for n_workers in args.workers:
+            result = measure(mode, n_workers, payload, args.requests_per_worker)
+            results.append(result)
+            print(f"{mode:7s} {n_workers:7d} {result['rss_mb_per_worker']:9.1f}MB {result['pss_mb_per_worker']:9.1f}MB "
+                  f"{result['private_mb_per_worker']:13.1f}MB {result['pss_mb_total']:8.1f}MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,142 @@
+"""Request payloads built from the bundled datasets."""
+import os
+import random
+from datetime import datetime, timedelta
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+dataset_dir = os.path.join(BASE_DIR, "dataset")
+
+profile_fields = [
+    "Age_Group", "Sex", "Year_Level", "In_relationship", "Personality", "Home_Region",
+    "Living_Situation", "Dorm_Area", "Roommates", "Degree_Program", "In_Organization",
+    "Hours_of_Study_per_Week", "Monthly_Allowance", "Family_Monthly_Income", "Have_Scholarship",
+    "Have_Job", "Meal_Preferences", "Frequency_of_Going_Home", "Have_Health_Concern",
+    "Preferred_Payment_Method"
+]
+
+transaction_files = [
+    "realistic_student_transactions_jan_to_mar_2025.csv",
+    "realistic_student_transactions_april_2025.csv",
+    "realistic_student_transactions_may_2025.csv"
+]
+
+def load_profiles():
+    df = pd.read_csv(os.path.join(dataset_dir, "Student-Spending-Habits.csv"), dtype=str).dropna()
+    # /predict parses the allowance with float(), which rejects thousands separators
+    df["Monthly_Allowance"] = df["Monthly_Allowance"].str.replace(",", "")
+    return df[profile_fields].to_dict("records")
+
+def load_transactions(user_id="bench-user"):
+    df = pd.concat(
+        [pd.read_csv(os.path.join(dataset_dir, name)) for name in transaction_files],
+        ignore_index=True
+    )
+    df["userId"] = user_id
+    return df.to_dict("records")
+
+def sample_payload():
+    return {"user_data": load_profiles()[0], "transactions": load_transactions()}
+
+# Spending patterns follow app/generateDummyData.py
+academic_items = ["Notebook", "Ballpen", "Photocopy", "Lab Manual", "Book"]
+leisure_items = ["Netflix", "Movie Ticket", "Mobile Game", "Snack Out", "Spotify"]
+transport_items = ["Jeep Fare", "Bus Fare", "Tricycle Fare", "Ride Share"]
+
+def synthetic_transactions(days, user_id="bench-user", end_date=datetime(2025, 5, 31), seed=0):
+    """A seeded history of the given number of days ending on end_date."""
+    rng = random.Random(seed)
+    transactions = []
+
+    def add(name, description, amount, category, date_str, type="Expense"):
+        transactions.append({
+            "userId": user_id, "name": name, "description": description, "totalAmount": amount,
+            "category": category, "type": type, "date": date_str
+        })
+
+    academic_days = set(rng.sample(range(1, 28), 3))
+    leisure_days = set(rng.sample(range(1, 28), 6))
+
+    current_date = end_date - timedelta(days=days - 1)
+    while current_date <= end_date:
+        day = current_date.day
+        date_str = current_date.strftime("%Y-%m-%d")
+
+        if current_date.weekday() < 6:
+            add("Daily Food", "Meal and drink", round(rng.uniform(100, 200), 2), "Food and Dining", date_str)
+        if rng.random() > 0.2:
+            for _ in range(rng.choice([1, 2])):
+                add(rng.choice(transport_items), "Daily commute", round(rng.uniform(10, 30), 2), "Transportation", date_str)
+        if day in leisure_days and rng.random() < 0.5:
+            add(rng.choice(leisure_items), "Leisure or entertainment", round(rng.uniform(50, 300), 2),
+                "Leisure and Entertainment", date_str)
+        if day in academic_days and rng.random() < 0.5:
+            add(rng.choice(academic_items), "Academic supplies or materials", round(rng.uniform(30, 500), 2),
+                "Academic", date_str)
+        if day == 28:
+            add("Monthly Allowance", "Allowance from parents", 10000, "Leisure and Entertainment", date_str, type="Income")
+            add("Monthly Rent", "Boarding house rent", 2500, "Living", date_str)
+        elif day == 29:
+            add("Electricity Bill", "Monthly electric bill", round(rng.uniform(250, 400), 2), "Living", date_str)
+        elif day == 30:
+            add("WiFi Bill", "Internet service fee", 350, "Living", date_str)
+
+        current_date += timedelta(days=1)
+    return transactions
+
+def previous_forecast(transactions, user_id="bench-user", days=45):
+    """A previous forecast covering the last days of the history, as the app would have stored it."""
+    end_date = max(pd.to_datetime(t["date"]) for t in transactions)
+    dates = pd.date_range(end=end_date, periods=days)
+    rng = random.Random(len(transactions))
+    return {
+        "userId": user_id,
+        "forecasted": [round(rng.uniform(150, 400), 2) for _ in dates],
+        "dates": dates.strftime('%Y-%m-%dT%H:%M:%S.000+00:00').tolist(),
+        "category": {
+            "living_expenses": 3000.0,
+            "food_and_dining_expenses": 3500.0,
+            "transportation_expenses": 900.0,
+            "academic_expenses": 500.0,
+            "leisure_and_entertainment_expenses": 800.0
+        }
+    }
+
+def predict_payload(profile, days, with_previous_forecast=False, user_id="bench-user", seed=0):
+    transactions = synthetic_transactions(days, user_id=user_id, seed=seed)
+    payload = {"user_data": profile, "transactions": transactions}
+    if with_previous_forecast:
+        payload["previous_forecast"] = previous_forecast(transactions, user_id=user_id)
+    return payload
+
+def generated_payloads(transactions_path, profiles_path):
+    """
+    /predict payloads for the users written by app/generateDummyData.py,
+    yielded one user at a time.
+    """
+    if transactions_path.endswith(".parquet"):
+        profiles = pd.read_parquet(profiles_path)
+        transactions = pd.read_parquet(transactions_path)
+    else:
+        profiles = pd.read_csv(profiles_path, dtype=str)
+        transactions = pd.read_csv(transactions_path)
+    profiles = profiles.set_index("userId")[profile_fields]
+    for user_id, user_transactions in transactions.groupby("userId", sort=False):
+        yield {
+            "user_data": profiles.loc[user_id].to_dict(),
+            "transactions": user_transactions.to_dict("records")
+        }
+
+def columnar_transactions(transactions):
+    """The columnar wire form of a list of transaction dicts."""
+    type_names = sorted({t["type"] for t in transactions} | {"Expense", "Income"})
+    category_names = sorted({t["category"] for t in transactions})
+    return {
+        "userId": transactions[0]["userId"] if transactions else "",
+        "date": [t["date"] for t in transactions],
+        "amount": [float(t["totalAmount"]) for t in transactions],
+        "type": [type_names.index(t["type"]) for t in transactions],
+        "category": [category_names.index(t["category"]) for t in transactions],
+        "type_names": type_names,
+        "category_names": category_names
+    }
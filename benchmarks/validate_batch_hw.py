@@ -0,0 +1,129 @@
+"""
+Accuracy of the batched NumPy Holt-Winters (engines.fit_batch) against the
+statsmodels fit forecast_expenses runs, and the time each takes.
+
+Every history is split into a training part and the 30 days after it. Both
+models forecast those 30 days from the training part; the script reports
+their mean absolute error against the actual days, how far the two
+forecasts are apart, and the difference in the forecast totals.
+
+It also checks that Exponential.forecast_batch and forecast_expenses agree
+when there is no previous forecast: both give up on the forecast with the
+same message, which /predict answers with its RF-only fallback.
+
+By default the histories are windows of the bundled
+realistic_student_transactions_*.csv data ending on different days. Pass
+--transactions with a file written by app/generateDummyData.py to validate
+on many generated users instead.
+
+Run from the repository root:
+    python -m benchmarks.validate_batch_hw [--transactions dataset/synthetic_transactions.csv] [--max-users 500]
+"""
+import argparse
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.holtwinters import ExponentialSmoothing
+from app import Exponential, engines
+from app.ingest import Transactions
+from app.smoothing import SEASONAL_PERIODS
+from benchmarks.payloads import load_transactions
+
+HORIZON = 30
+
+def bundled_histories(min_days):
+    """Windows of the bundled user's daily totals, each followed by HORIZON held-out days."""
+    daily = Transactions.from_records(load_transactions()).daily_amounts
+    return [daily[:end + HORIZON] for end in range(min_days, len(daily) - HORIZON + 1)]
+
+def generated_histories(path, max_users):
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    histories = []
+    for _, user_transactions in df.groupby("userId", sort=False):
+        histories.append(Transactions.from_records(user_transactions.to_dict("records")).daily_amounts)
+        if len(histories) == max_users:
+            break
+    return histories
+
+def user_transactions(path, max_users):
+    """Transactions of the generated users, or of the bundled user cut off every seventh day."""
+    if path:
+        df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+        groups = list(df.groupby("userId", sort=False))[:max_users]
+        return [Transactions.from_frame(group.reset_index(drop=True)) for _, group in groups]
+    records = load_transactions()
+    dates = sorted({record["date"] for record in records})
+    return [Transactions.from_records([r for r in records if r["date"] <= end]) for end in dates[::7]]
+
+def disagreements_without_previous_forecast(transactions):
+    """Users whose forecast_batch and forecast_expenses results disagree when no previous forecast is given."""
+    disagreeing = 0
+    for txns, batched in zip(transactions, Exponential.forecast_batch(transactions)):
+        single = Exponential.forecast_expenses(txns, None)
+        agree = single["success"] == batched["success"]
+        if agree and not single["success"]:
+            agree = str(single["message"]) == str(batched["message"])
+        disagreeing += not agree
+    return disagreeing
+
+def statsmodels_forecasts(train):
+    forecasts = []
+    for y in train:
+        fit = ExponentialSmoothing(y, trend='add', seasonal='add', seasonal_periods=SEASONAL_PERIODS).fit()
+        forecasts.append(fit.forecast(HORIZON))
+    return np.array(forecasts)
+
+def batch_forecasts(train):
+    width = max(len(y) for y in train)
+    Y = np.full((len(train), width), np.nan)
+    for row, y in enumerate(train):
+        Y[row, width - len(y):] = y
+    fitted = engines.fit_batch(Y, seasonal_periods=SEASONAL_PERIODS, trend=True, phi=1.0)
+    return engines.forecast_from_fit(fitted, HORIZON)
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--transactions", help="transactions written by app/generateDummyData.py")
+    parser.add_argument("--max-users", type=int, default=500)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    min_days = 2 * SEASONAL_PERIODS
+    histories = generated_histories(args.transactions, args.max_users) if args.transactions else bundled_histories(min_days)
+    histories = [y for y in histories if len(y) >= min_days + HORIZON]
+    if not histories:
+        raise SystemExit(f"no history has the {min_days + HORIZON} days needed")
+    train = [y[:-HORIZON] for y in histories]
+    actual = np.array([y[-HORIZON:] for y in histories])
+
+    transactions = user_transactions(args.transactions, args.max_users)
+    disagreeing = disagreements_without_previous_forecast(transactions)
+    print(f"without a previous forecast, forecast_batch agrees with forecast_expenses for "
+          f"{len(transactions) - disagreeing}/{len(transactions)} users")
+
+    reference, reference_seconds = timed(statsmodels_forecasts, train)
+    batched, batch_seconds = timed(batch_forecasts, train)
+
+    reference_mae = np.abs(reference - actual).mean(axis=1)
+    batch_mae = np.abs(batched - actual).mean(axis=1)
+    level = np.abs(actual).mean(axis=1)
+    gap = np.abs(batched - reference).mean(axis=1) / level
+    total_change = batched.sum(axis=1) / reference.sum(axis=1) - 1
+
+    print(f"{len(histories)} histories of {min(map(len, train))}-{max(map(len, train))} days, {HORIZON}-day horizon")
+    print(f"{'':26s} {'statsmodels':>12s} {'batched':>12s}")
+    print(f"{'holdout MAE, mean':26s} {reference_mae.mean():12.2f} {batch_mae.mean():12.2f}")
+    print(f"{'holdout MAE, median':26s} {np.median(reference_mae):12.2f} {np.median(batch_mae):12.2f}")
+    print(f"{'fit + forecast time':26s} {reference_seconds:11.2f}s {batch_seconds:11.2f}s")
+    print(f"batched MAE within 10% of statsmodels or better for {np.mean(batch_mae <= 1.1 * reference_mae):.0%} of histories")
+    print(f"forecast gap (mean |batched - statsmodels| / mean actual): median {np.median(gap):.1%}, p90 {np.percentile(gap, 90):.1%}")
+    print(f"forecast total change: median {np.median(total_change):+.1%}, "
+          f"p10 {np.percentile(total_change, 10):+.1%}, p90 {np.percentile(total_change, 90):+.1%}")
+    if disagreeing:
+        raise SystemExit(f"forecast_batch and forecast_expenses disagree for {disagreeing} users")
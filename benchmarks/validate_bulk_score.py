@@ -0,0 +1,76 @@
+"""
+Checks that app.bulkScore, run with its default options, writes for every
+user exactly what POST /predict returns for the same profile, transactions
+and previous forecast.
+
+The users get synthetic histories of 5 to 120 days, so every forecasting
+engine is covered, and every other user has a previous forecast. Both
+sides run in fresh processes: bulkScore as its CLI, /predict in this one
+through FastAPI's TestClient.
+
+Run from the repository root:
+    python -m benchmarks.validate_bulk_score [--users 40]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import pandas as pd
+from fastapi.testclient import TestClient
+from app.main import app
+from benchmarks.payloads import load_profiles, predict_payload
+
+def make_payloads(n_users):
+    profiles = load_profiles()
+    payloads = {}
+    for i in range(n_users):
+        user_id = f"bulk-{i:04d}"
+        days = 5 + (i * 23) % 116
+        payloads[user_id] = predict_payload(profiles[i % len(profiles)], days, with_previous_forecast=i % 2 == 0,
+                                            user_id=user_id, seed=i)
+    return payloads
+
+def write_inputs(payloads, directory):
+    """The payloads as the profiles, transactions and previous forecasts files bulkScore reads."""
+    paths = {name: os.path.join(directory, name) for name in ("profiles.csv", "transactions.csv", "previous.jsonl")}
+    pd.DataFrame([dict(userId=user_id, **payload["user_data"]) for user_id, payload in payloads.items()]) \
+        .to_csv(paths["profiles.csv"], index=False)
+    pd.DataFrame([t for payload in payloads.values() for t in payload["transactions"]]) \
+        .to_csv(paths["transactions.csv"], index=False)
+    with open(paths["previous.jsonl"], "w") as f:
+        for payload in payloads.values():
+            if "previous_forecast" in payload:
+                f.write(json.dumps(payload["previous_forecast"]) + "\n")
+    return paths
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=40)
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.users)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_inputs(payloads, directory)
+        output = os.path.join(directory, "budgets.jsonl")
+        subprocess.run([
+            sys.executable, "-m", "app.bulkScore", "--profiles", paths["profiles.csv"],
+            "--transactions", paths["transactions.csv"], "--previous-forecasts", paths["previous.jsonl"],
+            "--output", output, "--workers", "0"
+        ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(output) as f:
+            rows = {row.pop("userId"): row for row in map(json.loads, f)}
+
+    client = TestClient(app)
+    mismatched = []
+    for user_id, payload in payloads.items():
+        expected = client.post("/predict", json=payload).json()
+        if rows.get(user_id) != expected:
+            mismatched.append(user_id)
+
+    es_success = sum(bool(row.get("es_success")) for row in rows.values())
+    print(f"{len(payloads) - len(mismatched)}/{len(payloads)} users identical to /predict "
+          f"({es_success} with an ES forecast)")
+    if mismatched:
+        raise SystemExit(f"bulkScore output differs from /predict for {', '.join(mismatched[:10])}")
@@ -1,2 +1,43 @@
 #!/bin/bash
-uvicorn app.main:app --host 0.0.0.0 --port 10000
\ No newline at end of file
+# uvicorn worker processes
+export WEB_CONCURRENCY="${WEB_CONCURRENCY:-1}"
+# Worker processes for the Exponential Smoothing fit (0 runs it on threads of each uvicorn worker, still
+# under FORECAST_TIMEOUT). Every uvicorn worker starts its own pool, so the server runs
+# WEB_CONCURRENCY x (1 + FORECAST_POOL_SIZE) Python processes, each with its own pandas/statsmodels
+# (roughly 150 MB apiece). Size the two together against the instance's memory; with several uvicorn
+# workers the pool defaults to 0 and the workers run the fits
+if [ "$WEB_CONCURRENCY" -gt 1 ]; then
+    export FORECAST_POOL_SIZE="${FORECAST_POOL_SIZE:-0}"
+else
+    export FORECAST_POOL_SIZE="${FORECAST_POOL_SIZE:-2}"
+fi
+# With a pool or several uvicorn workers, the ES forecast cache and per-user ES state default to SQLite
+# files in CACHE_DIR shared by all those processes (set FORECAST_CACHE_PATH / ES_STATE_PATH to choose the files, or to an empty
+# value to keep them per process, where the incremental ES path mostly falls back to a full refit)
+export CACHE_DIR="${CACHE_DIR:-/tmp/foresight-cache}"
+# Seconds /predict waits for the forecast before answering with the RF-only fallback
+export FORECAST_TIMEOUT="${FORECAST_TIMEOUT:-10}"
+# /predict requests forecasting at once per uvicorn worker (0 admits all; defaults to two per pool process,
+# or two forecasting threads without a pool) and waiting up to ES_QUEUE_TIMEOUT seconds for a slot;
+# the rest get the RF-only prediction, or a 503 with Retry-After: ES_RETRY_AFTER when ES_OVERFLOW=reject
+export ES_MAX_CONCURRENT="${ES_MAX_CONCURRENT:-$((FORECAST_POOL_SIZE > 0 ? FORECAST_POOL_SIZE * 2 : 2))}"
+export ES_MAX_QUEUE="${ES_MAX_QUEUE:-16}"
+export ES_QUEUE_TIMEOUT="${ES_QUEUE_TIMEOUT:-2}"
+export ES_OVERFLOW="${ES_OVERFLOW:-fallback}"
+# /predict/batch takes one of those slots per ES_BATCH_CHUNK users, each chunk under FORECAST_TIMEOUT
+export ES_BATCH_CHUNK="${ES_BATCH_CHUNK:-8}"
+# DEBUG logs the grouped transactions and adjustment steps of every request
+export LOG_LEVEL="${LOG_LEVEL:-WARNING}"
+
+# mmap shares one copy of the forest between workers; pickle loads one per worker
+export MODEL_LOAD_MODE="${MODEL_LOAD_MODE:-mmap}"
+# Seconds between checks of app/models/CURRENT for a newly trained version (0 disables hot reload)
+export MODEL_RELOAD_INTERVAL="${MODEL_RELOAD_INTERVAL:-30}"
+# The /admin endpoints (model status, reload and rollback) stay disabled unless ADMIN_TOKEN is set;
+# requests must then send it in the X-Admin-Token header. Set it from a secret, not in this file
+# RF predictions remembered per student profile (0 disables); RF_CACHE_PATH shares them between workers
+export RF_CACHE_SIZE="${RF_CACHE_SIZE:-4096}"
+# Set TRANSACTION_STORE_PATH to a SQLite file to enable POST /transactions and /predict by userId;
+# left unset, the service stays stateless
+
+uvicorn app.main:app --host 0.0.0.0 --port 10000 --workers "$WEB_CONCURRENCY"